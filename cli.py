@@ -0,0 +1,112 @@
+"""不依赖PyQt5的命令行入口，用于脚本与服务器中的搜索
+
+每行输出一个JSON对象，结果在每个引擎解析完一页后立即输出：
+    {"type":"result","engine":引擎,"rank":排名,"title":标题,"desc":简述,"href":超链接}
+    {"type":"passage","engine":引擎,"rank":排名,"href":超链接,"html":文章HTML代码}
+    {"type":"engine","engine":引擎,"success":是否成功,"error":失败原因,"results":结果数,"elapsedMs":耗时,"cached":是否来自缓存}
+    {"type":"done","elapsedMs":总耗时}
+
+用法：
+    python cli.py "python 多线程"
+    python cli.py "python 多线程" -e CSDN -e CNBLOG -n 20 --passages 3
+    python cli.py "python" --suggest
+    python cli.py --batch queries.txt -o results.jsonl
+    python cli.py --serve                              启动守护进程
+    python cli.py "python" --remote                    通过守护进程搜索
+    python cli.py "python" --replay http://127.0.0.1:8766  从回放服务器读取录制的响应(见src/Replay.py)
+
+批量模式下每个检索词在所有引擎完成后向输出文件追加一行：
+    {"query":检索词,"elapsedMs":耗时,"engines":{引擎:{"success":是否成功,"error":失败原因,"elapsedMs":耗时,"results":[...]}}}
+中断后使用相同的参数重新运行即可从检查点继续，有失败页的检索词不写入输出文件，重新运行时只重试失败的页
+"""
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.joinpath("src")))
+from CrawlerFactory import CrawlerFactory
+from BatchSearch import BatchSearch, readQueries
+from SearchService import SearchService, JsonLinesWriter
+from Daemon import SearchDaemon, RemoteSearchService, DEFAULT_PORT
+from Replay import replayThrough
+
+def loadConfiguration(path):
+    """读取图形界面保存的配置，只使用与网络相关的项，读取失败时使用默认值
+
+    Args:
+        path (str): 配置文件路径
+
+    Returns:
+        dict: 配置
+    """
+    try:
+        with open(str(path), "r") as fp:
+            configuration = json.load(fp)
+    except Exception:
+        configuration = {}
+    configuration.setdefault("passageNum", 10)
+    configuration.setdefault("poolSize", 10)
+    configuration.setdefault("poolIdleTimeout", 60)
+    configuration.setdefault("concurrentPages", True)
+    configuration.setdefault("passageCachePath", str(Path(__file__).resolve().parent.joinpath("src","cache","passages.db")))
+    configuration.setdefault("keywordsTriePath", str(Path(__file__).resolve().parent.joinpath("src","cache","keywords.json")))
+    configuration.setdefault("connectTimeout", 5)
+    configuration.setdefault("readTimeout", 10)
+    configuration.setdefault("retries", 2)
+    configuration.setdefault("rateLimit", 5)
+    configuration.setdefault("rateBurst", 10)
+    configuration.setdefault("crawlerDeadline", 30)
+    return configuration
+
+def main(argv=None):
+    start = time.monotonic()
+    parser = argparse.ArgumentParser(description="EasySearch命令行搜索，结果以JSON行输出")
+    parser.add_argument("keyword", nargs="?", help="检索词，批量模式下不需要")
+    parser.add_argument("-e", "--engine", action="append", choices=CrawlerFactory.getCrawlerList(), help="搜索引擎，可重复指定，默认使用所有引擎")
+    parser.add_argument("-n", "--num", type=int, help="每个引擎的文章数，默认使用配置中的passageNum")
+    parser.add_argument("-p", "--passages", type=int, default=0, help="每个引擎下载排名前多少的文章，默认不下载")
+    parser.add_argument("-s", "--suggest", action="store_true", help="只输出检索词的智能提示")
+    parser.add_argument("-c", "--config", default=str(Path(__file__).resolve().parent.joinpath("src","settings.json")), help="配置文件路径")
+    parser.add_argument("-b", "--batch", help="批量模式，从文件中读取检索词，每行一个")
+    parser.add_argument("-o", "--output", default="results.jsonl", help="批量模式的输出文件")
+    parser.add_argument("-j", "--concurrency", type=int, default=8, help="批量模式同时抓取的最大页数")
+    parser.add_argument("--serve", nargs="?", type=int, const=DEFAULT_PORT, metavar="PORT", help="启动守护进程，只监听本机地址")
+    parser.add_argument("-r", "--remote", nargs="?", const="http://127.0.0.1:{0}".format(DEFAULT_PORT), metavar="URL", help="通过守护进程搜索")
+    parser.add_argument("--replay", metavar="URL", help="所有请求发往回放服务器，不访问网络")
+    parser.add_argument("--no-cache", action="store_true", help="不使用文章的磁盘缓存")
+    parser.add_argument("--ascii", action="store_true", help="输出中的非ASCII字符使用转义")
+    args = parser.parse_args(argv)
+    if args.keyword is None and args.batch is None and args.serve is None:
+        parser.error("需要指定检索词或--batch")
+
+    configuration = loadConfiguration(args.config)
+    if args.no_cache:
+        configuration["passageCachePath"] = None
+    if args.replay:
+        replayThrough(args.replay)
+    if args.serve is not None:
+        daemon = SearchDaemon(configuration, port=args.serve)
+        print("守护进程已启动：http://127.0.0.1:{0}".format(args.serve), file=sys.stderr)
+        daemon.serve()
+        return 0
+    writer = JsonLinesWriter(sys.stdout, args.ascii)
+    service = RemoteSearchService(args.remote) if args.remote else SearchService(configuration)
+
+    if args.batch is not None:
+        passageNum = args.num if args.num is not None else configuration["passageNum"]
+        batchSearch = BatchSearch(args.engine, passageNum, args.concurrency)
+        stats = batchSearch.run(readQueries(args.batch), args.output)
+        writer.write(type="batch", output=args.output, **stats)
+        completed = stats["failedUnits"] == 0
+    elif args.suggest:
+        writer.write(type="suggest", keyword=args.keyword, suggestions=service.suggest(args.keyword))
+        completed = True
+    else:
+        completed = service.search(args.keyword, args.engine, args.num, args.passages, writer)
+    service.save()
+    writer.write(type="done", elapsedMs=round((time.monotonic()-start)*1000))
+    return 0 if completed else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,24 +1,63 @@
 import sys,json
+import asyncio
+import threading
+import time
+STARTUP_TIME = time.perf_counter() #开始导入模块的时间，用于统计启动耗时
 sys.path.append("./src")
-from PyQt5.QtWidgets import QApplication, QSystemTrayIcon, QAction, QMenu, qApp
+from PyQt5.QtWidgets import QApplication, QSystemTrayIcon, QAction, QMenu, QMessageBox, qApp
 from PyQt5.QtGui import QIcon
-from PyQt5.QtCore import QThread, QThreadPool, QRunnable, Qt, QTimer, pyqtSignal
+from PyQt5.QtCore import QObject, QThread, QThreadPool, QRunnable, Qt, QTimer, pyqtSignal
 from src.SearchBar import SearchBar, Engine
-from src.InfoWindow import InfoWindow
 from src.CrawlerFactory import CrawlerFactory
-from src.SetDialog import SetDialog
+from Crawler import AbstractCrawler #与src内部模块使用同一个连接池
+from Prefetcher import PassagePrefetcher
+from ResultCache import ResultCache
+from KeywordsTrie import KeywordsTrie
+from Daemon import RemoteSearchService, RemoteCrawler
+import Keywords
 from system_hotkey import SystemHotkey
-import src.icons
+import icons #与src内部模块导入同一个模块，资源文件只注册一次
 from pathlib import Path
 import qdarkstyle
 import ctypes
 ctypes.windll.shell32.SetCurrentProcessExplicitAppUserModelID("myAppid")
 
+class StartupTimer(object):
+    """记录启动过程中各阶段距开始导入模块的耗时
+    """
+    def __init__(self, start):
+        self._start = start
+        self._marks = [] #(阶段,耗时(毫秒))
+
+    def mark(self, name):
+        self._marks.append((name, (time.perf_counter() - self._start) * 1000))
+
+    def report(self):
+        """生成启动耗时报告，同时说明预览用到的QtWebEngine是否已被加载
+        """
+        marks = "，".join("{0}{1:.0f}ms".format(name, elapsed) for name, elapsed in self._marks)
+        loaded = "已加载" if "PyQt5.QtWebEngineWidgets" in sys.modules else "未加载"
+        return "启动耗时：{0}；QtWebEngine{1}".format(marks, loaded)
+
 class EasySearch(object):
-    def __init__(self, configuration):
+    def __init__(self, configuration, startupTimer=None):
         self._config = configuration
-        self._searchBar = SearchBar()
+        AbstractCrawler.configurePool(self._config["poolSize"], self._config["poolIdleTimeout"]) #所有爬虫共享的长连接池
+        AbstractCrawler.configureTimeout(self._config["connectTimeout"], self._config["readTimeout"], self._config["retries"]) #所有请求的超时与重试
+        AbstractCrawler.configureRateLimit(self._config["rateLimit"], self._config["rateBurst"]) #所有请求共享的按网站限流
+        AbstractCrawler.configurePassageCache(self._config["passageCachePath"], self._config["passageCacheMemory"],
+                                              self._config["passageCacheTTL"], self._config["passageCacheDisk"]) #所有爬虫共享的文章缓存
+        self._daemon = None #守护进程的客户端，为None时在本进程中搜索
+        if self._config["daemonUrl"]:
+            daemon = RemoteSearchService(self._config["daemonUrl"])
+            if daemon.isAlive(): #守护进程未启动时退回本地搜索
+                self._daemon = daemon
+                Keywords.setSource(daemon.suggest)
+        self._keywordsTrie = KeywordsTrie.load(self._config["keywordsTriePath"]) #本地关键词补全
+        self._searchBar = SearchBar(trie=self._keywordsTrie)
         self._searchBar.show()
+        if startupTimer is not None:
+            startupTimer.mark("搜索栏显示")
         self._timer = QTimer() #用于解决托盘和失去焦点相互影响
         self._timer.timeout.connect(self._hideHandle)
         if self._config["loseFocusHidden"]: #是否启用失去焦点自动隐藏
@@ -28,60 +67,228 @@ class EasySearch(object):
             self._searchBar.addSearchEngine(engine)
         self._searchBar.comfirmSearch.connect(self._showSearchResults) #关键词确定后开启爬虫
         self._tray = Tray(self._searchBar)#创建托盘图标
+        if startupTimer is not None:
+            startupTimer.mark("托盘图标显示")
         self._tray.setNeed.connect(self._setNeedHandle)
+        self._tray.healthNeed.connect(self._healthNeedHandle)
         self._hotkey = HotKeyThread(self._config["hotkey"], self._searchBar)
+        self._passageLoaders = set() #正在加载的预览
+        self._prefetcher = PassagePrefetcher(self._config["prefetchTopK"], self._config["prefetchConcurrency"]) #后台预取排名靠前的文章
+        self._resultCache = ResultCache(self._config["resultCacheSize"], self._config["resultCacheTTL"], self._config["resultCacheStaleTTL"]) #搜索结果缓存
+
+    def saveState(self):
+        """退出前保存需要持久化的数据
+        """
+        self._keywordsTrie.save(self._config["keywordsTriePath"])
 
     def _showSearchResults(self,param):
-        """创建爬虫
+        """创建爬虫，结果缓存中新鲜的结果直接显示，陈旧的结果先显示再在后台重新搜索
 
         Args:
             param (tuple): (搜索引擎,搜索文本)
         """
+        from src.InfoWindow import InfoWindow #结果窗口与QtWebEngine在第一次搜索时才导入
+        self._prefetcher.cancel() #上一次搜索的预取不再需要
         self._infoWindow = InfoWindow() #必须设置成对象字段
+        self._infoWindow.previewNeed.connect(self._previewNeedHandle)
         self._infoWindow.show()
         self._crawlers = {}
+        self._refreshEngines = set() #显示陈旧结果、正在后台刷新的引擎
         searchEngineID,text = param 
-        if searchEngineID == "":
-            for engineID in CrawlerFactory.getCrawlerList():
-                crawler = CrawlerFactory.getCrawler(engineID)
-                crawler.setParam(text,self._config["passageNum"])
+        engineIDs = CrawlerFactory.getCrawlerList() if searchEngineID == "" else [searchEngineID]
+        runCrawlers = {}
+        for engineID in engineIDs:
+            crawler = self._createCrawler(engineID, text)
+            state, cached = self._resultCache.get(engineID, text, self._config["passageNum"])
+            if cached is not None:
+                crawler.loadResults(*cached)
+                self._crawlers[engineID] = crawler
+                self._showCrawlerResults(engineID, crawler)
+            if state == ResultCache.STALE:
+                self._refreshEngines.add(engineID)
+                runCrawlers[engineID] = self._createCrawler(engineID, text)
+            elif state is None:
                 self._crawlers[engineID] = crawler
+                runCrawlers[engineID] = crawler
+        for engineID in list(runCrawlers): #熔断中的引擎直接跳过，不再等待它超时
+            if self._daemon is None and not CrawlerFactory.isEngineAvailable(engineID):
+                del runCrawlers[engineID]
+                self._markEngineOpen(engineID)
+        if not runCrawlers:
+            self._crawlerManage = None
+            self._infoWindow.finishSearch()
+            return
+
+        if self._config["crawlerBackend"] == "asyncio" and self._daemon is None:
+            crawlerManage = AsyncCrawlerManage(runCrawlers, self._config["crawlerDeadline"])
         else:
-            crawler = CrawlerFactory.getCrawler(searchEngineID)
-            crawler.setParam(text,self._config["passageNum"])
-            self._crawlers[searchEngineID] = crawler
-        
-        self._crawlerManage = CrawlerManage(list(self._crawlers.values()))
+            crawlerManage = CrawlerManage(runCrawlers, self._config["crawlerDeadline"])
+        #旧的搜索仍可能在返回结果，只处理当前这次搜索的信号
+        crawlerManage.pageGot.connect(lambda engineID, results: self._pageGotHandle(crawlerManage, engineID, results))
+        crawlerManage.engineFinished.connect(lambda engineID, success: self._engineFinishedHandle(crawlerManage, text, runCrawlers[engineID], engineID, success))
+        crawlerManage.engineFailed.connect(lambda engineID, reason: self._engineFailedHandle(crawlerManage, engineID, reason))
+        crawlerManage.finished.connect(lambda: self._crawlerFinshedHandle(crawlerManage))
+        self._crawlerManage = crawlerManage
+        self._answeredEngines = set() #已返回结果或已结束的引擎
+        self._pendingEngines = set() #超过时间预算后仍在等待的引擎
+        if searchEngineID == "": #聚合搜索最多等待时间预算，之后先显示已返回的结果
+            QTimer.singleShot(self._config["searchBudget"], lambda: self._budgetExpiredHandle(crawlerManage, runCrawlers))
         self._crawlerManage.start()
-        self._crawlerManage.finished.connect(self._crawlerFinshedHandle)
-
-    def _crawlerFinshedHandle(self):
-        """爬虫完成后的槽函数
-        """
-        self._resultDict = {}
-        for id in self._crawlers:
-            results = []
-            icon = QIcon(CrawlerFactory.ENGINES[id]["icon"])
-            engineName = CrawlerFactory.ENGINES[id]["searchEngineName"]
-            titleList = self._crawlers[id].getTitleList()
-            descTextList = self._crawlers[id].getDescTextList()
-            for index in range(self._config["passageNum"]):
-                results.append({"title":titleList[index],"desc":descTextList[index]})
-            self._resultDict[id] = {"engineName":engineName,"icon":icon,"results":results}
-        self._infoWindow.showSearchPage(self._resultDict)
-        self._infoWindow.previewNeed.connect(self._previewNeedHandle)
+
+    def _createCrawler(self, engineID, text):
+        """按照配置构造爬虫
+
+        Args:
+            engineID (str): 搜索引擎
+            text (str): 搜索文本
+
+        Returns:
+            AbstractCrawler: 设置好参数的爬虫，连接守护进程时为RemoteCrawler
+        """
+        if self._daemon is not None:
+            crawler = RemoteCrawler(self._daemon, engineID)
+        else:
+            crawler = CrawlerFactory.getCrawler(engineID, self._config["concurrentPages"])
+        crawler.setParam(text,self._config["passageNum"])
+        return crawler
+
+    def _getEngineInfo(self, engineID):
+        """获取引擎的名称与图标
+
+        Args:
+            engineID (str): 搜索引擎
+
+        Returns:
+            tuple: (名称,图标)
+        """
+        return CrawlerFactory.ENGINES[engineID]["searchEngineName"], QIcon(CrawlerFactory.ENGINES[engineID]["icon"])
+
+    def _getResults(self, crawler):
+        """将爬虫的结果转换为结果页使用的格式
+        """
+        return [{"title":title,"desc":desc} for title, desc in zip(crawler.getTitleList(), crawler.getDescTextList())]
+
+    def _showCrawlerResults(self, engineID, crawler):
+        """一次性显示某个引擎的全部结果
+        """
+        engineName, icon = self._getEngineInfo(engineID)
+        self._infoWindow.appendSearchResults(engineID, engineName, icon, self._getResults(crawler))
+        self._prefetcher.prefetch(crawler)
+
+    def _pageGotHandle(self, crawlerManage, engineID, results):
+        """某个引擎一页结果解析完成后的槽函数，结果被追加到结果页
+
+        Args:
+            crawlerManage : 发出结果的爬虫管理对象
+            engineID (str): 搜索引擎
+            results (list): 该页的结果，每项为{"title":标题,"desc":简述}
+        """
+        if crawlerManage is not self._crawlerManage or engineID in self._refreshEngines: #刷新的结果完成后整体替换
+            return
+        engineName, icon = self._getEngineInfo(engineID)
+        self._answeredEngines.add(engineID)
+        self._infoWindow.appendSearchResults(engineID, engineName, icon, results)
+        self._clearPending(engineID)
+        self._prefetcher.prefetch(self._crawlers[engineID])
+
+    def _engineFinishedHandle(self, crawlerManage, text, crawler, engineID, success):
+        """某个引擎完成后的槽函数，结果写入缓存，后台刷新的结果替换掉陈旧结果
+
+        Args:
+            crawlerManage : 发出信号的爬虫管理对象
+            text (str): 搜索文本
+            crawler (AbstractCrawler): 完成的爬虫
+            engineID (str): 搜索引擎
+            success (bool): 爬虫是否正常完成
+        """
+        if crawlerManage is self._crawlerManage:
+            self._answeredEngines.add(engineID)
+            if success:
+                self._clearPending(engineID)
+        if not success or not crawler.getHrefList():
+            return
+        self._resultCache.put(engineID, text, self._config["passageNum"], crawler.getTitleList(), crawler.getDescTextList(), crawler.getHrefList())
+        if crawlerManage is self._crawlerManage and engineID in self._refreshEngines:
+            self._refreshEngines.discard(engineID)
+            self._crawlers[engineID] = crawler
+            engineName, icon = self._getEngineInfo(engineID)
+            self._infoWindow.replaceSearchResults(engineID, engineName, icon, self._getResults(crawler))
+            self._prefetcher.prefetch(crawler)
+
+    def _markEngineOpen(self, engineID):
+        """在结果页中将引擎标记为已熔断，显示过陈旧结果的引擎保留结果
+        """
+        self._refreshEngines.discard(engineID)
+        stats = CrawlerFactory.getHealthStats()[engineID]
+        engineName, icon = self._getEngineInfo(engineID)
+        if stats["state"] == "open":
+            tips = "最近失败率{0:.0%}，约{1:.0f}秒后在后台探测是否恢复".format(stats["errorRate"], stats["retryIn"])
+        else:
+            tips = "正在后台探测是否恢复"
+        self._infoWindow.setEngineState(engineID, engineName, icon, "已熔断", tips)
+
+    def _engineFailedHandle(self, crawlerManage, engineID, reason):
+        """某个引擎失败或超时后的槽函数，在结果页中标记该引擎
+
+        Args:
+            crawlerManage : 发出信号的爬虫管理对象
+            engineID (str): 搜索引擎
+            reason (str): 失败原因
+        """
+        if crawlerManage is not self._crawlerManage or engineID in self._refreshEngines: #刷新失败时保留陈旧结果
+            return
+        engineName, icon = self._getEngineInfo(engineID)
+        self._infoWindow.markEngineFailed(engineID, engineName, icon, reason)
+
+    def _budgetExpiredHandle(self, crawlerManage, runCrawlers):
+        """聚合搜索的时间预算用完后的槽函数，显示已返回的结果，尚未返回的引擎标记为等待中
+
+        Args:
+            crawlerManage : 爬虫管理对象
+            runCrawlers (dict): 正在运行的爬虫
+        """
+        if crawlerManage is not self._crawlerManage:
+            return
+        for engineID in runCrawlers:
+            if engineID not in self._answeredEngines and engineID not in self._refreshEngines:
+                self._pendingEngines.add(engineID)
+                engineName, icon = self._getEngineInfo(engineID)
+                self._infoWindow.setEngineState(engineID, engineName, icon, "等待中", "结果返回后会追加显示")
+        self._infoWindow.finishSearch()
+
+    def _clearPending(self, engineID):
+        """清除引擎的等待中标记
+        """
+        if engineID in self._pendingEngines:
+            self._pendingEngines.discard(engineID)
+            engineName, icon = self._getEngineInfo(engineID)
+            self._infoWindow.setEngineState(engineID, engineName, icon, "")
+
+    def _crawlerFinshedHandle(self, crawlerManage):
+        """所有爬虫完成后的槽函数
+        """
+        if crawlerManage is not self._crawlerManage:
+            return
+        self._infoWindow.finishSearch()
     
     def _previewNeedHandle(self, param):
-        """需要预览的槽函数
+        """需要预览的槽函数，先打开加载中的标签页，文章在后台线程中下载解析
 
         Args:
             param (预览所需要的参数): (搜索引擎,预览的索引)
         """
         engineID, index = param
-        href = self._crawlers[engineID].getHrefList()[index]
-        title = self._crawlers[engineID].getTitleList()[index]
-        htmlCode = self._crawlers[engineID].getPassage(index)        
-        self._infoWindow.showPreview(title,href, htmlCode, self._config)
+        crawler = self._crawlers[engineID]
+        href = crawler.getHrefList()[index]
+        title = crawler.getTitleList()[index]
+        tab = self._infoWindow.showPreview(title, href, None, self._config)
+        loader = PassageLoader(self._prefetcher, crawler, index)
+        loader.loaded.connect(tab.setHtml)
+        loader.failed.connect(tab.showError)
+        tab.closed.connect(loader.cancel) #标签页关闭后丢弃结果
+        loader.finished.connect(lambda: self._passageLoaders.discard(loader))
+        self._passageLoaders.add(loader) #保持引用直到线程结束
+        loader.start()
 
     def _hideHandle(self):
         """对窗口进行隐藏
@@ -103,9 +310,23 @@ class EasySearch(object):
             if self._config["loseFocusHidden"]: #是否启用失去焦点自动隐藏
                 self._searchBar.activationChange.connect(lambda: self._timer.start(200))
     
+    def _healthNeedHandle(self):
+        """显示各引擎的健康状况
+        """
+        states = {"closed":"正常", "open":"已熔断", "halfOpen":"探测中"}
+        lines = []
+        for engineID, stats in CrawlerFactory.getHealthStats().items():
+            latency = "{0:.0f}ms".format(stats["latencyMs"]) if stats["latencyMs"] is not None else "-"
+            lines.append("{0}：{1}，失败率{2:.0%}，平均耗时{3}，请求{4}次，跳过{5}次".format(
+                self._getEngineInfo(engineID)[0], states[stats["state"]], stats["errorRate"], latency, stats["requests"], stats["skipped"]))
+        coalesce = AbstractCrawler.getCoalesceStats()
+        lines.append("结果页请求：抓取{0}次，与相同的请求合并{1}次".format(coalesce["calls"], coalesce["shared"]))
+        QMessageBox.information(None, "引擎状态", "\n".join(lines))
+
     def _setNeedHandle(self):
         """设置菜单被点击时的槽函数
         """
+        from src.SetDialog import SetDialog #大多数时候不会打开设置，第一次打开时才导入
         self._setDialog = SetDialog(self._config)
         self._setDialog.updateNeed.connect(self._updateHandle)
         self._setDialog.show()
@@ -113,32 +334,179 @@ class EasySearch(object):
 class CrawlerTask(QRunnable):
     """线程池中需要完成的任务
     """
-    def __init__(self, crawlerObject):
+    def __init__(self, engineID, crawlerObject, crawlerManage):
         super().__init__()
+        self._engineID = engineID
         self._crawlerObject = crawlerObject
+        self._crawlerManage = crawlerManage
 
     def run(self):
-        self._crawlerObject.run()
+        self._crawlerObject.setPageCallback(lambda titleList, descTextList, hrefList: self._crawlerManage.emitPage(self._engineID, titleList, descTextList))
+        try:
+            self._crawlerObject.run()
+        except Exception as e: #异常不能抛出到Qt中，否则整个程序会退出
+            self._crawlerManage.taskFinished(self._engineID, str(e) or type(e).__name__)
+        else:
+            self._crawlerManage.taskFinished(self._engineID, None)
 
 class CrawlerManage(QThread):
-    """管理爬虫线程池的类
+    """管理爬虫线程池的类，每个引擎每解析完一页结果就发射一次pageGot信号
+
+    超过期限仍未完成的引擎会被标记为失败，之后它返回的结果都会被忽略，其余引擎的结果照常显示
     """
-    def __init__(self, crawlers):
+    pageGot = pyqtSignal(str, list) #(搜索引擎,该页结果)
+    engineFinished = pyqtSignal(str, bool) #某个引擎已结束，(搜索引擎,是否正常完成)
+    engineFailed = pyqtSignal(str, str) #某个引擎失败，(搜索引擎,失败原因)
+    _pool = None #所有搜索共享的线程池，被放弃的任务不会阻塞线程池的析构
+
+    def __init__(self, crawlers, deadline=30):
+        """
+        Args:
+            crawlers (dict): 搜索引擎 -> 爬虫
+            deadline (float, optional): 爬虫的最长运行时间(秒)
+        """
         super().__init__()
         self._crawlers = crawlers
+        self._deadline = deadline
+        self._condition = threading.Condition()
+        self._running = set(crawlers) #尚未结束且未被放弃的引擎
     
     def run(self):
-        pool = QThreadPool()
-        pool.setMaxThreadCount(10)
-        for crawler in self._crawlers:
-            crawlerTask = CrawlerTask(crawler)
-            pool.start(crawlerTask)
-        pool.waitForDone()
+        if CrawlerManage._pool is None:
+            CrawlerManage._pool = QThreadPool()
+            CrawlerManage._pool.setMaxThreadCount(10)
+        for engineID, crawler in self._crawlers.items():
+            crawlerTask = CrawlerTask(engineID, crawler, self)
+            CrawlerManage._pool.start(crawlerTask)
+        deadline = time.monotonic() + self._deadline
+        with self._condition:
+            while self._running and time.monotonic() < deadline:
+                self._condition.wait(deadline - time.monotonic())
+            timedOut = sorted(self._running)
+            self._running.clear() #放弃超时的引擎
+        for engineID in timedOut:
+            self._crawlers[engineID].abandon() #超时计入引擎的健康状况
+            self.engineFailed.emit(engineID, "超过{0}秒未完成".format(self._deadline))
+            self.engineFinished.emit(engineID, False)
+
+    def taskFinished(self, engineID, error):
+        """爬虫任务结束时调用，可在任意线程中调用
+
+        Args:
+            engineID (str): 搜索引擎
+            error (str): 失败原因，成功时为None
+        """
+        with self._condition:
+            if engineID not in self._running: #已因超时被放弃
+                return
+            self._running.discard(engineID)
+            if error is not None:
+                self.engineFailed.emit(engineID, error)
+            self.engineFinished.emit(engineID, error is None)
+            self._condition.notify_all()
+
+    def emitPage(self, engineID, titleList, descTextList):
+        """发射一页结果，可在任意线程中调用
+
+        Args:
+            engineID (str): 搜索引擎
+            titleList (list): 标题列表
+            descTextList (list): 简述列表
+        """
+        with self._condition:
+            if engineID not in self._running:
+                return
+        results = [{"title":title,"desc":desc} for title, desc in zip(titleList, descTextList)]
+        self.pageGot.emit(engineID, results)
+
+class PassageLoader(QThread):
+    """在后台线程中下载并解析文章，多个预览可以同时加载
+    """
+    loaded = pyqtSignal(str) #文章的HTML代码
+    failed = pyqtSignal(str) #错误信息
+
+    def __init__(self, prefetcher, crawler, index):
+        super().__init__()
+        self._prefetcher = prefetcher #已预取的文章直接使用
+        self._crawler = crawler
+        self._index = index
+        self._cancelled = False
+
+    def cancel(self):
+        """取消加载，正在进行的下载完成后结果会被丢弃
+        """
+        self._cancelled = True
+
+    def run(self):
+        try:
+            htmlCode = self._prefetcher.getPassage(self._crawler, self._index)
+        except Exception as e:
+            if not self._cancelled:
+                self.failed.emit(str(e))
+            return
+        if not self._cancelled:
+            self.loaded.emit(htmlCode)
+
+class AsyncCrawlerManage(QObject):
+    """用asyncio在独立的事件循环线程中并发运行爬虫，接口与CrawlerManage一致
+
+    事件循环不在界面线程中运行：轮询驱动会让界面线程在有协程等待(包括限流等待)时不断被唤醒，
+    并给每一步IO增加最多一个轮询间隔的延迟；结果与CrawlerManage一样通过信号回到界面线程
+    """
+    pageGot = pyqtSignal(str, list) #(搜索引擎,该页结果)
+    engineFinished = pyqtSignal(str, bool) #某个引擎已结束，(搜索引擎,是否正常完成)
+    engineFailed = pyqtSignal(str, str) #某个引擎失败，(搜索引擎,失败原因)
+    finished = pyqtSignal()
+
+    def __init__(self, crawlers, deadline=30):
+        """
+        Args:
+            crawlers (dict): 搜索引擎 -> 爬虫
+            deadline (float, optional): 爬虫的最长运行时间(秒)
+        """
+        super().__init__()
+        self._crawlers = crawlers
+        self._deadline = deadline
+
+    def start(self):
+        from AsyncCrawler import AsyncLoopThread #只有使用asyncio时才需要aiohttp
+        future = AsyncLoopThread.instance().submit(self._run())
+        future.add_done_callback(lambda future: self.finished.emit())
+
+    def emitPage(self, engineID, titleList, descTextList):
+        """发射一页结果
+
+        Args:
+            engineID (str): 搜索引擎
+            titleList (list): 标题列表
+            descTextList (list): 简述列表
+        """
+        results = [{"title":title,"desc":desc} for title, desc in zip(titleList, descTextList)]
+        self.pageGot.emit(engineID, results)
+
+    async def _run(self):
+        await asyncio.gather(*[self._runCrawler(engineID, crawler) for engineID, crawler in self._crawlers.items()])
+
+    async def _runCrawler(self, engineID, crawler):
+        from AsyncCrawler import AsyncCrawler #只有使用asyncio时才需要aiohttp
+        crawler.setPageCallback(lambda titleList, descTextList, hrefList: self.emitPage(engineID, titleList, descTextList))
+        try:
+            await asyncio.wait_for(crawler.runAsync(AsyncCrawler(crawler).run()), self._deadline) #结果写回同步爬虫
+        except asyncio.TimeoutError:
+            crawler.abandon() #超时计入引擎的健康状况
+            self.engineFailed.emit(engineID, "超过{0}秒未完成".format(self._deadline))
+        except Exception as e:
+            self.engineFailed.emit(engineID, str(e) or type(e).__name__)
+        else:
+            self.engineFinished.emit(engineID, True)
+            return
+        self.engineFinished.emit(engineID, False)
 
 class Tray(QSystemTrayIcon):
     """托盘类
     """
     setNeed = pyqtSignal()
+    healthNeed = pyqtSignal()
     def __init__(self, widget):
         self._widget = widget
         super().__init__()
@@ -148,8 +516,10 @@ class Tray(QSystemTrayIcon):
         showHiddenAction = QAction("显示/隐藏", self._menu, triggered = self._showHidden)
         quitAction = QAction("退出", self._menu, triggered=self._quitHandle)
         setAction = QAction("设置", self._menu, triggered=self.setNeed.emit)
+        healthAction = QAction("引擎状态", self._menu, triggered=self.healthNeed.emit)
         self._menu.addAction(showHiddenAction)
         self._menu.addAction(setAction)
+        self._menu.addAction(healthAction)
         self._menu.addSeparator()
         self._menu.addAction(quitAction)
         self.setContextMenu(self._menu)
@@ -216,6 +586,9 @@ class HotKeyThread(SystemHotkey, QThread):
             self._widget.activateWindow()
 
 if __name__ == '__main__':
+    startupTimer = StartupTimer(STARTUP_TIME)
+    startupTimer.mark("模块导入")
+    QApplication.setAttribute(Qt.AA_ShareOpenGLContexts) #QtWebEngine在QApplication创建之后才导入时必须设置
     app = QApplication(sys.argv)
     app.setStyleSheet(qdarkstyle.load_stylesheet(qt_api='pyqt5'))
     path = Path.cwd().joinpath("src","settings.json")
@@ -228,8 +601,34 @@ if __name__ == '__main__':
         configuration["defaultExportPath"] = str(Path.home().joinpath("Documents"))
         configuration["loseFocusHidden"] = True
         configuration["hotkey"] = ("control","alt","s")
-    easySearch = EasySearch(configuration)
+    #旧版本的配置文件中没有的项使用默认值
+    configuration.setdefault("poolSize", 10) #每个网站保持的最大连接数
+    configuration.setdefault("poolIdleTimeout", 60) #空闲连接的回收时间(秒)
+    configuration.setdefault("concurrentPages", True) #同一引擎的多页结果是否并发抓取
+    configuration.setdefault("prefetchTopK", 3) #每个引擎在后台预取的文章数，为0时不预取
+    configuration.setdefault("prefetchConcurrency", 2) #同时预取的最大文章数
+    configuration.setdefault("passageCachePath", str(Path.cwd().joinpath("src","cache","passages.db"))) #文章磁盘缓存的路径
+    configuration.setdefault("passageCacheMemory", 16*1024*1024) #文章内存缓存的最大字符数
+    configuration.setdefault("passageCacheDisk", 128*1024*1024) #文章磁盘缓存的最大字符数
+    configuration.setdefault("passageCacheTTL", 7*24*3600) #文章缓存的有效期(秒)
+    configuration.setdefault("resultCacheSize", 200) #最多缓存的搜索结果数
+    configuration.setdefault("resultCacheTTL", 600) #搜索结果直接使用的有效期(秒)
+    configuration.setdefault("resultCacheStaleTTL", 24*3600) #过期的搜索结果先显示再刷新的最长期限(秒)
+    configuration.setdefault("keywordsTriePath", str(Path.cwd().joinpath("src","cache","keywords.json"))) #本地关键词补全的保存路径
+    configuration.setdefault("connectTimeout", 5) #建立连接的超时时间(秒)
+    configuration.setdefault("readTimeout", 10) #读取响应的超时时间(秒)
+    configuration.setdefault("retries", 2) #幂等请求的最大重试次数
+    configuration.setdefault("rateLimit", 5) #每个网站每秒最多的请求数，为0时不限流
+    configuration.setdefault("rateBurst", 10) #每个网站允许突发的请求数
+    configuration.setdefault("crawlerDeadline", 30) #单个引擎的最长运行时间(秒)，超过后标记为失败
+    configuration.setdefault("searchBudget", 3000) #聚合搜索的时间预算(毫秒)，超过后先显示已返回的引擎
+    configuration.setdefault("crawlerBackend", "thread") #爬虫的运行方式，"thread"为线程池，"asyncio"为单线程协程
+    configuration.setdefault("daemonUrl", "") #守护进程的地址(例如http://127.0.0.1:8765)，为空时在本进程中搜索
+    easySearch = EasySearch(configuration, startupTimer)
+    if "--startup-report" in sys.argv: #第一次进入事件循环时窗口已经绘制，输出启动耗时
+        QTimer.singleShot(0, lambda: (startupTimer.mark("进入事件循环"), print(startupTimer.report())))
     app.exec_()
+    easySearch.saveState()
     with open(str(path),"w") as fp:
         json.dump(configuration,fp)
     sys.exit()
\ No newline at end of file
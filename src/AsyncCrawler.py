@@ -0,0 +1,290 @@
+import asyncio
+import threading
+import time
+from abc import ABC,abstractmethod
+import aiohttp
+from SessionPool import sessionPool, getBackoff, raiseForStatus, IDEMPOTENT_METHODS, RETRY_STATUS
+from RateLimiter import rateLimiter
+
+class AsyncSessionPool(object):
+    """asyncio爬虫共享的长连接池，每个事件循环对应一个aiohttp会话
+    """
+    def __init__(self, poolSize=100, poolSizePerHost=10, idleTimeout=60):
+        self._poolSize = poolSize #所有主机的最大连接数
+        self._poolSizePerHost = poolSizePerHost #每个主机的最大连接数
+        self._idleTimeout = idleTimeout #空闲连接的回收时间(秒)
+        self._sessions = {} #事件循环 -> aiohttp.ClientSession
+
+    def configure(self, poolSize=None, poolSizePerHost=None, idleTimeout=None):
+        """修改连接池参数，只对之后创建的会话生效
+
+        Args:
+            poolSize (int, optional): 所有主机的最大连接数
+            poolSizePerHost (int, optional): 每个主机的最大连接数
+            idleTimeout (float, optional): 空闲连接的回收时间(秒)
+        """
+        self._poolSize = poolSize if poolSize is not None else self._poolSize
+        self._poolSizePerHost = poolSizePerHost if poolSizePerHost is not None else self._poolSizePerHost
+        self._idleTimeout = idleTimeout if idleTimeout is not None else self._idleTimeout
+
+    def getSession(self):
+        """获取当前事件循环的会话，必须在协程中调用
+
+        Returns:
+            aiohttp.ClientSession: 会话
+        """
+        loop = asyncio.get_running_loop()
+        session = self._sessions.get(loop)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(limit=self._poolSize, limit_per_host=self._poolSizePerHost, keepalive_timeout=self._idleTimeout)
+            session = aiohttp.ClientSession(connector=connector)
+            self._sessions[loop] = session
+        return session
+
+    async def request(self, method, url, idempotent=None, **kwargs):
+        """发送请求并返回响应文本，超时、重试与限流都与同步连接池一致
+
+        Args:
+            method (str): 请求方法
+            url (str): 请求地址
+            idempotent (bool, optional): 请求是否幂等，幂等请求失败后会重试
+
+        Returns:
+            str: 响应文本
+
+        Raises:
+            requests.HTTPError: 重试用尽后状态码仍为4xx或5xx，与同步爬虫检查状态码后抛出的异常相同
+        """
+        settings = sessionPool.getTimeoutSettings()
+        kwargs.setdefault("timeout", aiohttp.ClientTimeout(sock_connect=settings["connectTimeout"], sock_read=settings["readTimeout"]))
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+        retries = settings["retries"] if idempotent else 0
+        host = sessionPool.getHost(url)
+        url = sessionPool.mapUrl(url) #与同步连接池使用相同的地址映射
+        for attempt in range(retries + 1):
+            await rateLimiter.acquireAsync(host) #与同步连接池共享同一个限流器
+            try:
+                async with self.getSession().request(method, url, **kwargs) as response:
+                    if response.status not in RETRY_STATUS or attempt >= retries:
+                        raiseForStatus(response.status, response.reason, str(response.url)) #只返回文本，调用者无法检查状态码
+                        return await response.text()
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if attempt >= retries:
+                    raise
+            await asyncio.sleep(getBackoff(attempt, settings["backoff"], settings["maxBackoff"]))
+
+    async def close(self):
+        """关闭当前事件循环的会话
+        """
+        session = self._sessions.pop(asyncio.get_running_loop(), None)
+        if session is not None:
+            await session.close()
+
+asyncSessionPool = AsyncSessionPool() #进程内共享的asyncio连接池
+
+class AsyncAbstractCrawler(ABC):
+    """asyncio爬虫的抽象类，与AbstractCrawler的接口一一对应，run与getPassage为协程
+    """
+    @abstractmethod
+    def setParam(self, keyword, passageNum):
+        """设置爬虫参数
+
+        Args:
+            keyword (str): 检索词
+            passageNum (int): 查询的文章数
+        """
+        pass
+
+    @abstractmethod
+    async def run(self):
+        """爬虫启动协程
+        """
+        pass
+
+    @abstractmethod
+    async def getPassage(self, index):
+        """获取索引对应的文章的HTML代码
+
+        Args:
+            index (int): 文章索引
+        """
+        pass
+
+    @abstractmethod
+    def getTitleList(self):
+        """获取检索到的文章标题列表
+        """
+        pass
+
+    @abstractmethod
+    def getDescTextList(self):
+        """获取检索到的文章简述列表
+        """
+        pass
+
+    @abstractmethod
+    def getHrefList(self):
+        """获取检索到的文章的超链接列表
+        """
+        pass
+
+class AsyncCrawler(AsyncAbstractCrawler):
+    """原生asyncio爬虫，复用同步爬虫的地址构造与页面解析，所有页在同一线程中并发抓取
+
+    抓取结果写回被包装的同步爬虫，因此之后仍可直接使用同步爬虫的接口；
+    结果页请求与同步爬虫共用同一个请求合并表，相同的并发搜索只抓取一次
+    """
+    def __init__(self, crawler, pageConcurrency=None):
+        self._crawler = crawler
+        self._pageConcurrency = pageConcurrency #同时抓取的最大页数，为None时不限制
+        self._sessionPool = asyncSessionPool
+
+    def setParam(self, keyword, passageNum):
+        self._crawler.setParam(keyword, passageNum)
+
+    async def run(self):
+        pageNums = range(self._crawler.getPageCount())
+        semaphore = asyncio.Semaphore(self._pageConcurrency or len(pageNums) or 1)
+        tasks = [asyncio.ensure_future(self._crawlPage(pageNum, semaphore)) for pageNum in pageNums]
+        try:
+            for task in tasks: #按页码顺序合并，前面的页完成后即可回调
+                self._crawler._addPageInfo(await task)
+        finally:
+            for task in tasks:
+                task.cancel()
+        self._crawler._truncateResults()
+
+    async def getPassage(self, index):
+        href = self.getHrefList()[index]
+        htmlCode = self._crawler._passageCache.get(href)
+        if htmlCode is None:
+            htmlResponse = await self._sessionPool.request("GET", href, headers=self._crawler._headers)
+            htmlCode = self._crawler._getPassageHtml(htmlResponse)
+            self._crawler._passageCache.put(href, htmlCode)
+        return htmlCode
+
+    def getTitleList(self):
+        return self._crawler.getTitleList()
+
+    def getDescTextList(self):
+        return self._crawler.getDescTextList()
+
+    def getHrefList(self):
+        return self._crawler.getHrefList()
+
+    def getCrawler(self):
+        """获取被包装的同步爬虫
+        """
+        return self._crawler
+
+    async def _crawlPage(self, pageNum, semaphore):
+        crawler = self._crawler
+        return await crawler._pageFlight.doAsync(crawler._getPageKey(pageNum), self._fetchPage, crawler._getPageUrl(pageNum), semaphore)
+
+    async def _fetchPage(self, url, semaphore):
+        async with semaphore:
+            responseText = await self._sessionPool.request(self._crawler._pageMethod, url, headers=self._crawler._headers, idempotent=True)
+        return self._crawler._getInfo(responseText)
+
+class SyncCrawlerAdapter(AsyncAbstractCrawler):
+    """将同步爬虫适配为asyncio接口，阻塞的部分在事件循环的线程池中执行
+    """
+    def __init__(self, crawler):
+        self._crawler = crawler
+
+    def setParam(self, keyword, passageNum):
+        self._crawler.setParam(keyword, passageNum)
+
+    async def run(self):
+        await asyncio.get_running_loop().run_in_executor(None, self._crawler.run)
+
+    async def getPassage(self, index):
+        return await asyncio.get_running_loop().run_in_executor(None, self._crawler.getPassage, index)
+
+    def getTitleList(self):
+        return self._crawler.getTitleList()
+
+    def getDescTextList(self):
+        return self._crawler.getDescTextList()
+
+    def getHrefList(self):
+        return self._crawler.getHrefList()
+
+    def getCrawler(self):
+        """获取被包装的同步爬虫
+        """
+        return self._crawler
+
+class AsyncLoopThread(object):
+    """在独立的守护线程中运行asyncio事件循环，其他线程(例如界面线程)向它提交协程
+
+    事件循环阻塞在选择器上等待IO与定时器，没有协程时不占用CPU，也不需要界面线程定时驱动；
+    协程的结果通过Future返回，需要更新界面时由协程发射Qt信号
+    """
+    _instance = None
+    _instanceLock = threading.Lock()
+
+    def __init__(self):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name="asyncio", daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def instance(cls):
+        """获取全局唯一的事件循环线程，第一次调用时启动
+        """
+        with cls._instanceLock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
+
+    def submit(self, coroutine):
+        """提交协程，可在任意线程中调用
+
+        Args:
+            coroutine : 需要执行的协程
+
+        Returns:
+            concurrent.futures.Future: 协程的结果，完成回调在事件循环线程中调用
+        """
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+async def runCrawlers(crawlers):
+    """并发运行多个asyncio爬虫
+
+    Args:
+        crawlers (list): AsyncAbstractCrawler列表
+
+    Returns:
+        list: 每个爬虫的异常，成功时为None
+    """
+    results = await asyncio.gather(*[crawler.run() for crawler in crawlers], return_exceptions=True)
+    return [result if isinstance(result, BaseException) else None for result in results]
+
+if __name__ == '__main__':
+    #对比同一检索词下原生asyncio爬虫与同步爬虫适配器的耗时
+    import sys
+    from CrawlerFactory import CrawlerFactory
+    keyword = sys.argv[1] if len(sys.argv) > 1 else "python"
+    passageNum = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    async def benchmark(wrapper):
+        crawlers = []
+        for engineID in CrawlerFactory.getCrawlerList():
+            crawler = wrapper(CrawlerFactory.getCrawler(engineID))
+            crawler.setParam(keyword, passageNum)
+            crawlers.append(crawler)
+        start = time.perf_counter()
+        errors = await runCrawlers(crawlers)
+        elapsed = time.perf_counter() - start
+        await asyncSessionPool.close()
+        return elapsed, errors
+
+    for name, wrapper in (("SyncCrawlerAdapter", SyncCrawlerAdapter), ("AsyncCrawler", AsyncCrawler)):
+        elapsed, errors = asyncio.run(benchmark(wrapper))
+        print("{0}: {1:.3f}s, errors: {2}".format(name, elapsed, errors))
@@ -0,0 +1,216 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from CrawlerFactory import CrawlerFactory
+
+def readQueries(path):
+    """读取检索词文件，每行一个检索词，忽略空行、以#开头的行与重复的检索词
+
+    Args:
+        path (str): 文件路径
+
+    Returns:
+        list: 检索词
+    """
+    queries = []
+    with open(str(path), "r", encoding="utf-8") as fp:
+        for line in fp:
+            query = line.strip()
+            if query and not query.startswith("#") and query not in queries:
+                queries.append(query)
+    return queries
+
+class BatchSearch(object):
+    """批量搜索，将(检索词,引擎,页码)作为最小任务交给有界线程池并发执行
+
+    每个检索词的所有页都成功后向输出文件追加一行结果；每完成一页都写入检查点，
+    中断后重新运行时跳过输出文件中已有的检索词，并复用检查点中已抓取的页，
+    有失败页的检索词不写入输出文件，重新运行时只重试失败的页
+
+    批量任务直接使用未包装的爬虫，不经过熔断器：一个引擎暂时故障时不会让之后所有检索词的该引擎都被跳过
+    """
+    def __init__(self, engineIDs=None, passageNum=10, concurrency=8):
+        self._engineIDs = engineIDs or CrawlerFactory.getCrawlerList() #使用的搜索引擎
+        self._passageNum = passageNum #每个引擎的文章数
+        self._concurrency = concurrency #同时抓取的最大页数
+        self._lock = threading.Lock()
+        self._stats = {"queries":0, "resumedQueries":0, "failedQueries":0, "units":0, "resumedUnits":0, "failedUnits":0}
+
+    def run(self, queries, outputPath, checkpointPath=None):
+        """执行批量搜索，所有检索词都成功后删除检查点
+
+        Args:
+            queries (list): 检索词
+            outputPath (str): 输出的JSON行文件，每行对应一个检索词
+            checkpointPath (str, optional): 检查点文件，默认为输出文件加上.checkpoint后缀
+
+        Returns:
+            dict: 统计信息
+        """
+        start = time.monotonic()
+        checkpointPath = checkpointPath or str(outputPath) + ".checkpoint"
+        finished = self._loadFinished(outputPath)
+        pages = self._loadCheckpoint(checkpointPath)
+        queries = [query for query in queries if query not in finished]
+        self._stats["resumedQueries"] = len(finished)
+        Path(outputPath).parent.mkdir(parents=True, exist_ok=True)
+        with open(str(outputPath), "a", encoding="utf-8") as output, open(checkpointPath, "a", encoding="utf-8") as checkpoint:
+            self._endLine(outputPath, output)
+            self._endLine(checkpointPath, checkpoint)
+            executor = ThreadPoolExecutor(max_workers=self._concurrency)
+            try:
+                futures = []
+                for query in queries:
+                    futures.extend(self._submitQuery(executor, query, pages, output, checkpoint))
+                for future in futures:
+                    future.result()
+            except BaseException: #中断时丢弃尚未开始的任务，已完成的页保留在检查点中
+                for future in futures:
+                    future.cancel()
+                executor.shutdown(wait=False)
+                raise
+            executor.shutdown()
+        stats = self.getStats()
+        if stats["failedQueries"] == 0:
+            os.remove(checkpointPath)
+        stats["elapsedMs"] = round((time.monotonic()-start)*1000)
+        return stats
+
+    def getStats(self):
+        """获取统计信息
+
+        Returns:
+            dict: queries为本次完成的检索词数，resumedQueries为之前已完成的检索词数，failedQueries为有失败页、
+                  需要重新运行的检索词数，units为本次抓取的页数，resumedUnits为从检查点复用的页数，failedUnits为失败的页数
+        """
+        with self._lock:
+            return dict(self._stats)
+
+    def _submitQuery(self, executor, query, pages, output, checkpoint):
+        """提交一个检索词的所有页
+
+        Returns:
+            list: 提交的Future
+        """
+        state = {"start":None, "remaining":0, "engines":{}}
+        crawlers = {}
+        for engineID in self._engineIDs:
+            crawler = CrawlerFactory.ENGINES[engineID]["class"]() #不经过熔断器，失败的页留到重新运行时重试
+            crawler.setParam(query, self._passageNum)
+            crawlers[engineID] = crawler
+            state["engines"][engineID] = {"pages":[None]*crawler.getPageCount(), "error":None, "start":None, "end":None}
+            state["remaining"] += crawler.getPageCount()
+        futures = []
+        for engineID, crawler in crawlers.items():
+            for pageNum in range(crawler.getPageCount()):
+                pageInfo = pages.get((query, engineID, pageNum))
+                if pageInfo is not None:
+                    with self._lock:
+                        self._stats["resumedUnits"] += 1
+                    self._finishUnit(query, state, crawlers, engineID, pageNum, pageInfo, None, output)
+                else:
+                    futures.append(executor.submit(self._runUnit, query, state, crawlers, engineID, pageNum, output, checkpoint))
+        return futures
+
+    def _runUnit(self, query, state, crawlers, engineID, pageNum, output, checkpoint):
+        """抓取一页，成功时写入检查点
+
+        错误状态码的页面由爬虫抛出requests.HTTPError；第一页没有解析出任何结果时多半是限流或反爬页面，
+        同样记为失败，不写入检查点，重新运行时会重试
+        """
+        now = time.monotonic()
+        with self._lock:
+            state["start"] = state["start"] or now
+            engine = state["engines"][engineID]
+            engine["start"] = engine["start"] or now
+        try:
+            pageInfo = crawlers[engineID].crawlPage(pageNum)
+            if pageNum == 0 and not pageInfo[2]:
+                raise ValueError("第一页没有解析出结果")
+        except Exception as e:
+            self._finishUnit(query, state, crawlers, engineID, pageNum, None, str(e) or type(e).__name__, output)
+            return
+        line = json.dumps({"query":query, "engine":engineID, "page":pageNum, "info":pageInfo}, ensure_ascii=False)
+        with self._lock:
+            checkpoint.write(line + "\n")
+            checkpoint.flush()
+            self._stats["units"] += 1
+        self._finishUnit(query, state, crawlers, engineID, pageNum, pageInfo, None, output)
+
+    def _finishUnit(self, query, state, crawlers, engineID, pageNum, pageInfo, error, output):
+        """记录一页的结果，检索词的所有页完成后合并结果并写入输出文件
+        """
+        now = time.monotonic()
+        with self._lock:
+            engine = state["engines"][engineID]
+            engine["pages"][pageNum] = pageInfo
+            engine["end"] = now
+            if error is not None:
+                engine["error"] = engine["error"] or error
+                self._stats["failedUnits"] += 1
+            state["remaining"] -= 1
+            if state["remaining"]:
+                return
+            if any(result["error"] is not None for result in state["engines"].values()): #成功的页已在检查点中
+                self._stats["failedQueries"] += 1
+                return
+            record = {"query":query, "engines":{}, "elapsedMs":round((now-state["start"])*1000) if state["start"] else 0}
+            for resultEngineID, result in state["engines"].items():
+                crawler = crawlers[resultEngineID]
+                crawler.loadPages([info for info in result["pages"] if info is not None])
+                record["engines"][resultEngineID] = {
+                    "success":result["error"] is None, "error":result["error"],
+                    "elapsedMs":round((result["end"]-result["start"])*1000) if result["start"] else 0,
+                    "results":[{"title":title, "desc":desc, "href":href} for title, desc, href in
+                               zip(crawler.getTitleList(), crawler.getDescTextList(), crawler.getHrefList())]}
+            output.write(json.dumps(record, ensure_ascii=False) + "\n")
+            output.flush()
+            self._stats["queries"] += 1
+
+    def _endLine(self, path, fp):
+        """中断时可能留下写了一半的行，追加前先换行
+        """
+        with open(str(path), "rb") as reader:
+            reader.seek(0, os.SEEK_END)
+            if reader.tell() == 0:
+                return
+            reader.seek(-1, os.SEEK_END)
+            if reader.read(1) != b"\n":
+                fp.write("\n")
+
+    def _loadFinished(self, outputPath):
+        """读取输出文件中已完成的检索词，忽略中断时写了一半的行
+        """
+        finished = set()
+        try:
+            with open(str(outputPath), "r", encoding="utf-8") as fp:
+                for line in fp:
+                    try:
+                        finished.add(json.loads(line)["query"])
+                    except (ValueError, KeyError):
+                        pass
+        except FileNotFoundError:
+            pass
+        return finished
+
+    def _loadCheckpoint(self, checkpointPath):
+        """读取检查点中已抓取的页
+
+        Returns:
+            dict: (检索词,引擎,页码) -> (标题列表,简述列表,超链接列表)
+        """
+        pages = {}
+        try:
+            with open(checkpointPath, "r", encoding="utf-8") as fp:
+                for line in fp:
+                    try:
+                        unit = json.loads(line)
+                        pages[(unit["query"], unit["engine"], unit["page"])] = tuple(unit["info"])
+                    except (ValueError, KeyError):
+                        pass
+        except FileNotFoundError:
+            pass
+        return pages
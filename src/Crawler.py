@@ -1,10 +1,105 @@
+import contextvars
+import json
 from abc import ABC,abstractmethod
-import requests
-from lxml import etree
+from concurrent.futures import ThreadPoolExecutor
+import Extraction
+from SessionPool import sessionPool
+from RateLimiter import rateLimiter
+from PassageCache import passageCache
+from ResultCache import normalizeKeyword
+from SingleFlight import SingleFlight
 
 class AbstractCrawler(ABC):
     """爬虫的抽象类，用于统一爬虫的接口
+
+    具体爬虫只需要实现setParam以及_getPageUrl、_getInfo、_getPassageHtml三个钩子，
+    分页抓取、结果合并与文章下载由抽象类统一完成
     """
+    _sessionPool = sessionPool #所有爬虫实例共享的长连接池
+    _rateLimiter = rateLimiter #所有请求共享的按主机限流器
+    _passageCache = passageCache #所有爬虫实例共享的文章缓存
+    _pageMethod = "GET" #抓取搜索结果页使用的请求方法
+    _pageFlight = SingleFlight() #所有爬虫实例共享，相同的结果页同一时刻只抓取一次
+
+    def __init__(self):
+        self._titleList = []
+        self._descTextList = []
+        self._hrefList = []
+        self._headers = {}
+        self._pageConcurrency = 1 #同时抓取的最大页数，为1时逐页顺序抓取
+        self._pageCallback = None #每合并一页结果后的回调
+
+    @classmethod
+    def configurePool(cls, poolSize=None, idleTimeout=None):
+        """设置共享连接池的参数
+
+        Args:
+            poolSize (int, optional): 每个主机的最大连接数
+            idleTimeout (float, optional): 空闲连接的回收时间(秒)
+        """
+        cls._sessionPool.configure(poolSize, idleTimeout)
+
+    @classmethod
+    def configureTimeout(cls, connectTimeout=None, readTimeout=None, retries=None):
+        """设置所有请求的超时与重试参数
+
+        Args:
+            connectTimeout (float, optional): 建立连接的超时时间(秒)
+            readTimeout (float, optional): 读取响应的超时时间(秒)
+            retries (int, optional): 最大重试次数
+        """
+        cls._sessionPool.configureTimeout(connectTimeout, readTimeout, retries)
+
+    @classmethod
+    def configureRateLimit(cls, rate=None, burst=None):
+        """设置每个主机的限流参数
+
+        Args:
+            rate (float, optional): 每秒允许的请求数，为0时不限流
+            burst (int, optional): 允许突发的请求数
+        """
+        cls._rateLimiter.configure(rate, burst)
+
+    @classmethod
+    def getRateLimitStats(cls):
+        """获取限流的等待统计
+
+        Returns:
+            dict: 主机 -> 各优先级的请求数与等待时间
+        """
+        return cls._rateLimiter.getStats()
+
+    @classmethod
+    def getCoalesceStats(cls):
+        """获取结果页请求合并的统计
+
+        Returns:
+            dict: calls为真正抓取的页数，shared为与正在进行的抓取合并的页数，inFlight为正在抓取的页数
+        """
+        return cls._pageFlight.getStats()
+
+    @classmethod
+    def getPoolStats(cls):
+        """获取共享连接池的连接复用统计
+
+        Returns:
+            dict: 主机 -> 统计信息
+        """
+        return cls._sessionPool.getStats()
+
+    @classmethod
+    def configurePassageCache(cls, path=None, maxMemoryBytes=None, ttl=None, maxDiskBytes=None):
+        """设置共享文章缓存的参数
+
+        Args:
+            path (str, optional): 磁盘缓存的SQLite文件路径，为None时只使用内存缓存
+            maxMemoryBytes (int, optional): 内存缓存的最大字符数
+            ttl (float, optional): 缓存的有效期(秒)
+            maxDiskBytes (int, optional): 磁盘缓存的最大字符数
+        """
+        cls._passageCache.configure(maxMemoryBytes, ttl, maxDiskBytes)
+        cls._passageCache.setPath(path)
+
     @abstractmethod
     def setParam(self, keyword, passageNum):
         """设置爬虫参数
@@ -15,50 +110,196 @@ class AbstractCrawler(ABC):
         """
         pass
 
-    @abstractmethod
+    def setPageConcurrency(self, pageConcurrency):
+        """设置并发抓取的最大页数
+
+        Args:
+            pageConcurrency (int): 最大并发页数，为1时逐页顺序抓取
+        """
+        self._pageConcurrency = max(1, int(pageConcurrency))
+
+    def setPageCallback(self, callback):
+        """设置每页结果合并后的回调，回调在运行爬虫的线程中按页码顺序调用
+
+        Args:
+            callback (callable): 参数为该页的(标题列表,简述列表,超链接列表)
+        """
+        self._pageCallback = callback
+
     def run(self):
-        """爬虫启动程序
+        """爬虫启动程序，所有页并发抓取后按页码顺序合并结果
         """
-        pass
+        pageNums = range(self._pageNum)
+        workers = min(self._pageConcurrency, len(pageNums))
+        if workers > 1:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                #每页复制一份调用者的上下文，请求优先级等上下文变量在工作线程中同样生效
+                futures = [executor.submit(contextvars.copy_context().run, self.crawlPage, pageNum) for pageNum in pageNums]
+                for future in futures: #按页码顺序合并结果
+                    self._addPageInfo(future.result())
+        else:
+            for pageNum in pageNums:
+                self._addPageInfo(self.crawlPage(pageNum))
+        self._truncateResults()
+
+    def getPageCount(self):
+        """获取本次搜索需要抓取的结果页数，需先调用setParam
+        """
+        return self._pageNum
+
+    def crawlPage(self, pageNum):
+        """单独抓取并解析一页搜索结果，不修改爬虫状态，可在多个线程中同时调用
+
+        引擎、规范化后的检索词、文章数与页码都相同的并发请求只抓取一次，所有调用者得到同一个结果
+
+        Args:
+            pageNum (int): 页码，从0开始
+
+        Returns:
+            tuple: (标题列表,简述列表,超链接列表)，多个调用者共享，不能修改
+        """
+        return self._pageFlight.do(self._getPageKey(pageNum), self._crawlPage, self._getPageUrl(pageNum))
+
+    def loadPages(self, pageInfos):
+        """按页码顺序合并单独抓取的各页结果，结果与run相同
+
+        Args:
+            pageInfos (list): 按页码排列的(标题列表,简述列表,超链接列表)
+        """
+        self.loadResults([], [], [])
+        for pageInfo in pageInfos:
+            self._addPageInfo(pageInfo)
+        self._truncateResults()
 
-    @abstractmethod
     def getPassage(self, index):
-        """获取索引对应的文章的HTML代码
+        """获取索引对应的文章的HTML代码，优先从文章缓存中读取
 
         Args:
             index (int): 文章索引
+
+        Returns:
+            str: 文章正文的HTML代码
         """
-        pass
+        href = self._hrefList[index]
+        htmlCode = self._passageCache.get(href)
+        if htmlCode is None:
+            response = self._sessionPool.get(href, headers=self._headers)
+            response.raise_for_status() #错误页面不能当作文章缓存
+            htmlCode = self._getPassageHtml(response.text)
+            self._passageCache.put(href, htmlCode)
+        return htmlCode
+
+    def loadResults(self, titleList, descTextList, hrefList):
+        """直接载入已有的结果(例如缓存的结果)，之后无需运行即可预览
+
+        Args:
+            titleList (list): 标题列表
+            descTextList (list): 简述列表
+            hrefList (list): 超链接列表
+        """
+        self._titleList = list(titleList)
+        self._descTextList = list(descTextList)
+        self._hrefList = list(hrefList)
 
-    @abstractmethod
     def getTitleList(self):
         """获取检索到的文章标题列表
         """
-        pass
-    
-    @abstractmethod
+        return self._titleList
+
     def getDescTextList(self):
         """获取检索到的文章简述列表
         """
-        pass
+        return self._descTextList
 
-    @abstractmethod
     def getHrefList(self):
         """获取检索到的文章的超链接列表
         """
+        return self._hrefList
+
+    def _getPageKey(self, pageNum):
+        """获取合并结果页请求的键，线程与协程中的抓取使用相同的键
+
+        Args:
+            pageNum (int): 页码，从0开始
+        """
+        return (type(self).__name__, normalizeKeyword(self._keyword), self._passageNum, pageNum)
+
+    def _truncateResults(self):
+        """将结果截断为设置的文章数
+        """
+        self._titleList = self._titleList[:self._passageNum]
+        self._descTextList = self._descTextList[:self._passageNum]
+        self._hrefList = self._hrefList[:self._passageNum]
+
+    def _crawlPage(self, url):
+        """抓取并解析一页搜索结果，不修改爬虫状态，可在多个线程中同时调用
+
+        Args:
+            url (str): 搜索结果页地址
+
+        Returns:
+            tuple: (标题列表,简述列表,超链接列表)
+
+        Raises:
+            requests.HTTPError: 响应的状态码为4xx或5xx，错误页面不会被当作没有结果的结果页
+        """
+        response = self._sessionPool.request(self._pageMethod, url, headers=self._headers, idempotent=True) #搜索请求都可以安全地重试
+        response.raise_for_status()
+        return self._getInfo(response.text)
+
+    def _addPageInfo(self, pageInfo):
+        """将一页的结果追加到结果列表，超出设置文章数的部分被丢弃
+
+        Args:
+            pageInfo (tuple): (标题列表,简述列表,超链接列表)
+        """
+        remaining = max(self._passageNum - len(self._titleList), 0)
+        titleList, descTextList, hrefList = [info[:remaining] for info in pageInfo]
+        self._titleList.extend(titleList)
+        self._descTextList.extend(descTextList)
+        self._hrefList.extend(hrefList)
+        if self._pageCallback is not None and titleList:
+            self._pageCallback(titleList, descTextList, hrefList)
+
+    @abstractmethod
+    def _getPageUrl(self, pageNum):
+        """获取搜索结果页的地址
+
+        Args:
+            pageNum (int): 页码，从0开始
+        """
+        pass
+
+    @abstractmethod
+    def _getInfo(self, responseText):
+        """从搜索结果页中提取文章信息
+
+        Args:
+            responseText (str): 搜索结果页的响应文本
+
+        Returns:
+            tuple: (标题列表,简述列表,超链接列表)
+        """
+        pass
+
+    @abstractmethod
+    def _getPassageHtml(self, htmlResponse):
+        """从文章页面中提取正文的HTML代码
+
+        Args:
+            htmlResponse (str): 文章页面的HTML代码
+        """
         pass
 
 class CSDNCrawler(AbstractCrawler):
     """CSDN爬虫
     """
+    _pageMethod = "POST"
+
     def __init__(self):
         super().__init__()
-        self._responseText = ""
-        self._titleList = []
-        self._descTextList = []
-        self._hrefList = []
         self._passagePerPage = 25
-    
+
     def setParam(self, keyword, passageNum):
         self._keyword = keyword
         self._passageNum = passageNum
@@ -68,60 +309,27 @@ class CSDNCrawler(AbstractCrawler):
             "user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/90.0.4430.93 Safari/537.36",
             "accept": "application/json, text/plain, */*"
             }
-    
-    def run(self):
-        for pageNum in range(self._pageNum):
-            self._url = "https://so.csdn.net/api/v3/search?q="+self._keyword+"&t=all&p="+str(pageNum+1)+"&s=0&tm=0&lv=-1&ft=0&l=&u=&ct=-1&pnt=-1&ry=-1&ss=-1&dct=-1&vco=-1&cc=-1&sc=-1&akt=-1&art=-1&ca=-1&prs=&pre=&ecc=-1&ebc=-1&platform=pc"
-            # self._url = self._url.encode("utf-8").decode("latin1")
-            self.__getPage()
-            self.__getInfo()
-        self._titleList = self._titleList[:self._passageNum]
-        self._descTextList = self._descTextList[:self._passageNum]
-        self._hrefList = self._hrefList[:self._passageNum]
 
-    def getPassage(self,index):
-        htmlResponse = requests.get(self._hrefList[index], headers=self._headers).text
-        htmlTree = etree.HTML(htmlResponse)
-        postBody = htmlTree.xpath('//div[@id="article_content"]')[0]
-        htmlTtml = etree.tostring(postBody, method='html', with_tail=False).decode('UTF-8')
-        return htmlTtml
-    
-    def getTitleList(self):
-        return self._titleList
-    
-    def getDescTextList(self):
-        return self._descTextList
-    
-    def getHrefList(self):
-        return self._hrefList
+    def _getPageUrl(self, pageNum):
+        return "https://so.csdn.net/api/v3/search?q="+self._keyword+"&t=all&p="+str(pageNum+1)+"&s=0&tm=0&lv=-1&ft=0&l=&u=&ct=-1&pnt=-1&ry=-1&ss=-1&dct=-1&vco=-1&cc=-1&sc=-1&akt=-1&art=-1&ca=-1&prs=&pre=&ecc=-1&ebc=-1&platform=pc"
 
-    def __getPage(self):
-        self._responseText = requests.post(self._url, headers=self._headers).json()
-    
-    def __getInfo(self):
-        items = dict(self._responseText)['result_vos']
+    def _getPassageHtml(self, htmlResponse):
+        return Extraction.extractHtml(htmlResponse, Extraction.CSDN_PASSAGE)
+
+    def _getInfo(self, responseText):
+        titleList, descTextList, hrefList = [], [], []
+        items = dict(json.loads(responseText))['result_vos']
         for item in items:
-            # 获取 title
-            title = str(item['title']).replace('<em>', '')
-            title = title.replace('</em>', '')
-            self._titleList.append(title)
-            # 获取 desc
-            desc = str(item['description']).replace('<em>', '')
-            desc = desc.replace('</em>', '')
-            self._descTextList.append(desc)
-            # 获取 href
-            href = str(item['url'])
-            self._hrefList.append(href)
+            titleList.append(Extraction.removeHighlight(str(item['title'])))
+            descTextList.append(Extraction.removeHighlight(str(item['description'])))
+            hrefList.append(str(item['url']))
+        return titleList, descTextList, hrefList
 
 class CNBLOGCrawler(AbstractCrawler):
     """博客园爬虫
     """
     def __init__(self):
         super().__init__()
-        self._responseText = ""
-        self._titleList = []
-        self._descTextList = []
-        self._hrefList = []
         self._passagePerPage = 10
 
     def setParam(self, keyword, passageNum):
@@ -135,70 +343,20 @@ class CNBLOGCrawler(AbstractCrawler):
                 'cookie': '_ga=GA1.2.119028761.1619010923; is-side-open=open; theme=light; UM_distinctid=17910d3e5a2268-08537109682ccf-d7e163f-13c680-17910d3e5a3284; _gid=GA1.2.508121567.1619794817; __utmz=59123430.1619799574.1.1.utmcsr=cnblogs.com|utmccn=(referral)|utmcmd=referral|utmcct=/; ShitNoRobotCookie=CfDJ8L-rpLgFVEJMgssCVvNUAjvY50IQtGLoLSL77V7sLBNi9i-7q1haepEJ7RVzvnbDvqLh91A4KewjDSpqd6jdwV9a6CyONjkq8pUY2VzAYVcOX_YBkKx4oUHzuWQ1Gj6GFA; DetectCookieSupport=OK; __utmc=59123430; __utmt=1; __utma=59123430.119028761.1619010923.1619799573.1619876071.2; __utmb=59123430.3.10.1619876072'
         }
 
-    def run(self):
-        for pageNum in range(self._pageNum):
-            self._url = 'https://zzk.cnblogs.com/s/blogpost?Keywords=' + self._keyword + '&pageindex=' + str(pageNum)
-            self.__getPage()
-            self.__getInfo()
-        self._titleList = self._titleList[:self._passageNum]
-        self._descTextList = self._descTextList[:self._passageNum]
-        self._hrefList = self._hrefList[:self._passageNum]
-
-    def getPassage(self, index):
-        htmlResponse = requests.get(self._hrefList[index], headers=self._headers).text
-        htmlTree = etree.HTML(htmlResponse)
-        postBody = htmlTree.xpath('//div[@id="cnblogs_post_body"]')[0]
+    def _getPageUrl(self, pageNum):
+        return 'https://zzk.cnblogs.com/s/blogpost?Keywords=' + self._keyword + '&pageindex=' + str(pageNum)
 
-        htmlHtml = etree.tostring(postBody, method='html', with_tail=False).decode('UTF-8')
+    def _getPassageHtml(self, htmlResponse):
+        return Extraction.extractHtml(htmlResponse, Extraction.CNBLOG_PASSAGE)
 
-        return htmlHtml
-
-    def getTitleList(self):
-        return self._titleList
-    
-    def getDescTextList(self):
-        return self._descTextList
-    
-    def getHrefList(self):
-        return self._hrefList
-    
-    def __getPage(self):
-        response = requests.get(self._url, headers=self._headers)
-        self._responseText = response.text
-        self._tree = etree.HTML(self._responseText)
-
-    def __getInfo(self):
-        items = self._tree.xpath(".//div[@class='forflow']/div[@class='searchItem']")
-        for item in items:
-            # 获取 title
-            title = str(item.xpath("./h3//text()"))
-            title = title.split(',')
-            titleName = ''
-            for i in range(1, len(title)-1):
-                titleName += title[i]
-                titleName = titleName.replace("'", "")
-                titleName = titleName.replace(" ", "")
-            self._titleList.append(titleName)
-            # 获取 desc
-            desc = str(item.xpath("./span[@class='searchCon']/text()"))
-
-            desc = desc.replace(r"\n", "")
-            desc = desc.replace(" ", '')
-            self._descTextList.append(desc)
-            # 获取 href
-            href = str(item.xpath("./h3/a/@href")[0])
-            href = href.replace("'", "")
-            self._hrefList.append(href)
+    def _getInfo(self, responseText):
+        return Extraction.extractItems(responseText, Extraction.CNBLOG_ITEMS, Extraction.CNBLOG_TITLE, Extraction.CNBLOG_DESC, Extraction.CNBLOG_HREF)
 
 class ELECFANSCrawler(AbstractCrawler):
     """电子发烧友爬虫
     """
     def __init__(self):
         super().__init__()
-        self._responseText = ""
-        self._titleList = []
-        self._descTextList = []
-        self._hrefList = []
         self._passagePerPage = 10
 
     def setParam(self, keyword, passageNum):
@@ -210,50 +368,11 @@ class ELECFANSCrawler(AbstractCrawler):
             "user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/90.0.4430.93 Safari/537.36",
             }
 
-    def run(self):
-        for pageNum in range(self._pageNum):
-            self._url = 'https://s.elecfans.com/s?type=0&keyword=' + self._keyword + '&page=' + str(pageNum)
-            self.__getPage()
-            self.__getInfo()
-        self._titleList = self._titleList[:self._passageNum]
-        self._descTextList = self._descTextList[:self._passageNum]
-        self._hrefList = self._hrefList[:self._passageNum]
+    def _getPageUrl(self, pageNum):
+        return 'https://s.elecfans.com/s?type=0&keyword=' + self._keyword + '&page=' + str(pageNum)
 
-    def getPassage(self, index):
-        htmlResponse = requests.get(self._hrefList[index], headers=self._headers).text
-        htmlTree = etree.HTML(htmlResponse)
-        try:
-            postBody = htmlTree.xpath('//div[@class="simditor-body clearfix"]')[0]
-            htmlHtml = etree.tostring(postBody, method='html', with_tail=False).decode('UTF-8')
-        except:
-            postBody = htmlTree.xpath('//div[@id ="mainContent"]')[0]
-            htmlHtml = etree.tostring(postBody, method='html', with_tail=False).decode('UTF-8')
-        return htmlHtml
-
-    def getTitleList(self):
-        return self._titleList
-    
-    def getDescTextList(self):
-        return self._descTextList
-    
-    def getHrefList(self):
-        return self._hrefList
-    
-    def __getPage(self):
-        response = requests.get(self._url, headers=self._headers)
-        self._responseText = response.text
-        self._tree = etree.HTML(self._responseText)
-
-    def __getInfo(self):
-        items = self._tree.xpath('//div[@class="list"]/ul/li')
-        for item in items:
-            # 获取 title
-            title = str(item.xpath("./h2/a//text()")).replace('[', '').replace(']', '').replace("'", '').replace(',', '').replace(' ', '')
-            self._titleList.append(title)
-            # 获取 desc
-            desc = str(item.xpath('./div/p[1]//text()')).replace('[', '').replace(']', '').replace("'", '').replace(',', '').replace(' ', '')
-            self._descTextList.append(desc)
-            # 获取 href
-            href = str(item.xpath("./h2/a/@href")[0])
-            self._hrefList.append(href)
+    def _getPassageHtml(self, htmlResponse):
+        return Extraction.extractHtml(htmlResponse, *Extraction.ELECFANS_PASSAGE)
 
+    def _getInfo(self, responseText):
+        return Extraction.extractItems(responseText, Extraction.ELECFANS_ITEMS, Extraction.ELECFANS_TITLE, Extraction.ELECFANS_DESC, Extraction.ELECFANS_HREF)
@@ -1,25 +1,52 @@
 from Crawler import *
+from EngineHealth import GuardedCrawler, circuitBreaker
 class CrawlerFactory(object):
     #支持的搜索引擎
     CSDN = "CSDN"
     CNBLOG = "CNBLOG"
     ELECFANS = "ELECFANS"
     ENGINES = {
-        CSDN:{"searchEngineName":"CSDN","class":CSDNCrawler,"passagePerPage":25, "icon":":/src/engineIcon/csdn.ico"},
-        CNBLOG:{"searchEngineName":"博客园","class":CNBLOGCrawler,"passagePerPage":10, "icon":":/src/engineIcon/cnblogs.ico"},
-        ELECFANS:{"searchEngineName":"电子发烧友","class":ELECFANSCrawler,"passagePerPage":10, "icon":":/src/engineIcon/elecfans.ico"}
-        }#爬虫的中文名，构造对象，每页爬取的文章数
+        CSDN:{"searchEngineName":"CSDN","class":CSDNCrawler,"passagePerPage":25, "pageConcurrency":2, "icon":":/src/engineIcon/csdn.ico", "domain":"csdn.net"},
+        CNBLOG:{"searchEngineName":"博客园","class":CNBLOGCrawler,"passagePerPage":10, "pageConcurrency":4, "icon":":/src/engineIcon/cnblogs.ico", "domain":"cnblogs.com"},
+        ELECFANS:{"searchEngineName":"电子发烧友","class":ELECFANSCrawler,"passagePerPage":10, "pageConcurrency":4, "icon":":/src/engineIcon/elecfans.ico", "domain":"elecfans.com"}
+        }#爬虫的中文名，构造对象，每页爬取的文章数，同时抓取的最大页数，文章所在的域名
     @classmethod
-    def getCrawler(cls, searchEngineID):
-        """根据输入构造相应爬虫
+    def getCrawler(cls, searchEngineID, concurrentPages=True):
+        """根据输入构造相应爬虫，爬虫前加有该引擎的熔断器
 
         Args:
             searchEngineID (str): 爬虫对应的ID
+            concurrentPages (bool, optional): 是否并发抓取多页结果
 
         Returns:
-            AbstractCrawler: 构造的爬虫对象
+            GuardedCrawler: 构造的爬虫对象，接口与AbstractCrawler一致
         """
-        return cls.ENGINES[searchEngineID]["class"]() #利用字典实现switch case语句
+        crawler = cls.ENGINES[searchEngineID]["class"]() #利用字典实现switch case语句
+        if concurrentPages:
+            crawler.setPageConcurrency(cls.ENGINES[searchEngineID]["pageConcurrency"])
+        return GuardedCrawler(searchEngineID, crawler, circuitBreaker)
+    @classmethod
+    def isEngineAvailable(cls, searchEngineID):
+        """引擎是否可用，熔断中的引擎应直接跳过
+
+        Args:
+            searchEngineID (str): 爬虫对应的ID
+
+        Returns:
+            bool: 熔断器关闭时为True
+        """
+        return circuitBreaker.allowRequest(searchEngineID)
+    @classmethod
+    def getHealthStats(cls):
+        """获取各引擎的健康统计
+
+        Returns:
+            dict: 引擎id -> 状态、最近失败率、耗时滑动平均等
+        """
+        stats = circuitBreaker.getStats()
+        for engineID in cls.getCrawlerList():
+            stats.setdefault(engineID, circuitBreaker.getHealth(engineID).getStats())
+        return stats
     @classmethod
     def getCrawlerList(cls):
         """返回支持的引擎
@@ -29,6 +56,8 @@ class CrawlerFactory(object):
         """
         return [cls.CSDN, cls.CNBLOG, cls.ELECFANS]
 
+circuitBreaker.setCrawlerFactory(lambda searchEngineID: CrawlerFactory.ENGINES[searchEngineID]["class"]()) #熔断后用未包装的爬虫探测引擎是否恢复
+
 if __name__ == '__main__':
     crawler = CrawlerFactory.getCrawler(CrawlerFactory.ELECFANS)
     crawler.setParam("python",10)
@@ -0,0 +1,298 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+import requests
+from CrawlerFactory import CrawlerFactory
+from SearchService import SearchService
+
+DEFAULT_PORT = 8765 #守护进程默认监听的端口
+
+class BadRequest(Exception):
+    """请求参数错误，返回400
+    """
+    pass
+
+class DaemonHandler(BaseHTTPRequestHandler):
+    """守护进程的请求处理
+
+    GET /search?q=检索词&engine=引擎&num=文章数&passages=下载的文章数  以JSON行流式返回SearchService.search的记录
+    GET /suggest?q=关键词                                              返回{"suggestions":提示列表}
+    GET /passage?engine=引擎&url=文章地址                               返回{"html":文章正文}，只接受该引擎的文章地址
+    GET /stats                                                         返回各个共享组件的统计信息
+    """
+    protocol_version = "HTTP/1.0" #以关闭连接表示流式响应结束
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        query = parse_qs(parts.query)
+        routes = {"/search":self._search, "/suggest":self._suggest, "/passage":self._passage, "/stats":self._stats}
+        route = routes.get(parts.path)
+        if route is None:
+            self._sendJson(404, {"error":"未知的路径" + parts.path})
+            return
+        self._streaming = False #已经发送了流式响应的响应头，之后不能再发送错误响应
+        try:
+            route(query)
+        except Exception as e:
+            if self._streaming: #只能关闭连接，RemoteSearchService把缺少记录的引擎记为失败
+                return
+            if isinstance(e, BadRequest):
+                self._sendJson(400, {"error":str(e)})
+            elif isinstance(e, PermissionError):
+                self._sendJson(403, {"error":str(e)})
+            else:
+                self._sendJson(500, {"error":str(e) or type(e).__name__})
+
+    def log_message(self, format, *args): #不在标准错误中输出每个请求
+        pass
+
+    def _search(self, query):
+        keyword = self._getParam(query, "q")
+        engineIDs = self._getEngines(query)
+        passageNum = self._getInt(query, "num", None, 1)
+        passages = self._getInt(query, "passages", 0, 0)
+        self.send_response(200) #参数都检查过后才发送响应头，之后的错误只能通过关闭连接表示
+        self.send_header("Content-Type", "application/x-ndjson; charset=utf-8")
+        self.end_headers()
+        self._streaming = True
+        lock = threading.Lock()
+        disconnected = [] #客户端断开后丢弃之后的记录，不让写入错误变成引擎的失败
+        def write(**record):
+            line = json.dumps(record, ensure_ascii=False) + "\n"
+            with lock:
+                if disconnected:
+                    return
+                try:
+                    self.wfile.write(line.encode("utf-8"))
+                    self.wfile.flush()
+                except OSError:
+                    disconnected.append(True)
+        self.server.service.search(keyword, engineIDs, passageNum, passages, write)
+
+    def _suggest(self, query):
+        self._sendJson(200, {"suggestions":self.server.service.suggest(self._getParam(query, "q"))})
+
+    def _passage(self, query):
+        engineID = self._checkEngine(self._getParam(query, "engine"))
+        self._sendJson(200, {"html":self.server.service.passage(engineID, self._getParam(query, "url"))})
+
+    def _stats(self, query):
+        self._sendJson(200, self.server.service.getStats())
+
+    def _getParam(self, query, name):
+        """获取必需的参数，缺少时抛出BadRequest
+        """
+        if not query.get(name):
+            raise BadRequest("缺少参数" + name)
+        return query[name][0]
+
+    def _getInt(self, query, name, default, minimum):
+        """获取整数参数，不是整数或小于最小值时抛出BadRequest
+        """
+        if name not in query:
+            return default
+        try:
+            value = int(query[name][0])
+        except ValueError:
+            raise BadRequest("参数{0}不是整数".format(name))
+        if value < minimum:
+            raise BadRequest("参数{0}不能小于{1}".format(name, minimum))
+        return value
+
+    def _getEngines(self, query):
+        """获取搜索引擎参数，包含不支持的引擎时抛出BadRequest
+
+        Returns:
+            list: 搜索引擎，没有指定时为None
+        """
+        engineIDs = query.get("engine")
+        for engineID in engineIDs or []:
+            self._checkEngine(engineID)
+        return engineIDs
+
+    def _checkEngine(self, engineID):
+        """不支持的搜索引擎抛出BadRequest
+
+        Returns:
+            str: 搜索引擎
+        """
+        if engineID not in CrawlerFactory.ENGINES:
+            raise BadRequest("未知的引擎" + engineID)
+        return engineID
+
+    def _sendJson(self, status, content):
+        body = json.dumps(content, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+class SearchDaemon(ThreadingHTTPServer):
+    """常驻的本地搜索服务，连接池、缓存与关键词前缀树在多次搜索之间保持，
+    图形界面、命令行与编辑器插件都可以作为它的客户端
+    """
+    daemon_threads = True
+
+    def __init__(self, configuration, host="127.0.0.1", port=DEFAULT_PORT):
+        """
+        Args:
+            configuration (dict): 配置
+            host (str, optional): 监听的地址，默认只接受本机的连接
+            port (int, optional): 监听的端口
+        """
+        self.service = SearchService(configuration)
+        super().__init__((host, port), DaemonHandler)
+
+    def serve(self):
+        """处理请求直至被中断，退出前保存关键词前缀树
+        """
+        try:
+            self.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.server_close()
+            self.service.save()
+
+class RemoteSearchService(object):
+    """守护进程的客户端，接口与SearchService一致
+    """
+    def __init__(self, url="http://127.0.0.1:{0}".format(DEFAULT_PORT), timeout=60):
+        self._url = url.rstrip("/")
+        self._timeout = timeout #读取超时(秒)，搜索时为两条记录之间的最长间隔
+        self._session = requests.Session() #本机的请求不经过爬虫的连接池与限流器
+
+    def search(self, keyword, engineIDs=None, passageNum=None, passages=0, write=None):
+        """在守护进程中搜索，记录到达后立即交给输出函数
+
+        守护进程出错时只能关闭连接结束流式响应，因此没有收到结束记录的引擎被记为失败，
+        并补充一条失败的引擎记录
+
+        Returns:
+            bool: 是否所有引擎都成功完成
+        """
+        params = {"q":keyword, "engine":engineIDs or [], "passages":passages}
+        if passageNum is not None:
+            params["num"] = passageNum
+        success = True
+        finished = set() #收到结束记录的引擎
+        with self._session.get(self._url + "/search", params=params, stream=True, timeout=(3, self._timeout)) as response:
+            if response.status_code != 200:
+                raise RuntimeError(response.json().get("error", response.status_code))
+            for line in response.iter_lines():
+                if line:
+                    record = json.loads(line.decode("utf-8"))
+                    if record["type"] == "engine":
+                        finished.add(record["engine"])
+                        success = success and record["success"]
+                    write(**record)
+        for engineID in engineIDs or CrawlerFactory.getCrawlerList():
+            if engineID not in finished:
+                success = False
+                write(type="engine", engine=engineID, success=False, error="守护进程没有返回该引擎的结果",
+                      results=None, elapsedMs=None, cached=False)
+        return success
+
+    def suggest(self, keyword, limit=10):
+        return self._getJson("/suggest", {"q":keyword})["suggestions"][:limit]
+
+    def passage(self, engineID, href):
+        return self._getJson("/passage", {"engine":engineID, "url":href})["html"]
+
+    def getStats(self):
+        return self._getJson("/stats", {})
+
+    def save(self):
+        """数据由守护进程保存，这里无需处理
+        """
+        pass
+
+    def isAlive(self):
+        """守护进程是否可以连接
+        """
+        try:
+            self._session.get(self._url + "/stats", timeout=1)
+            return True
+        except requests.RequestException:
+            return False
+
+    def _getJson(self, path, params):
+        response = self._session.get(self._url + path, params=params, timeout=(3, self._timeout))
+        content = response.json()
+        if response.status_code != 200:
+            raise RuntimeError(content.get("error", response.status_code))
+        return content
+
+class RemoteCrawler(object):
+    """通过守护进程搜索的爬虫，接口与AbstractCrawler一致，用于图形界面的瘦客户端模式
+    """
+    def __init__(self, client, engineID):
+        """
+        Args:
+            client (RemoteSearchService): 守护进程的客户端
+            engineID (str): 搜索引擎
+        """
+        self._client = client
+        self._engineID = engineID
+        self._keyword = ""
+        self._passageNum = 10
+        self._pageCallback = None
+        self._titleList = []
+        self._descTextList = []
+        self._hrefList = []
+
+    def setParam(self, keyword, passageNum):
+        self._keyword = keyword
+        self._passageNum = passageNum
+
+    def setPageConcurrency(self, pageConcurrency):
+        """并发由守护进程决定，忽略
+        """
+        pass
+
+    def setPageCallback(self, callback):
+        """设置结果回调，守护进程每返回一条结果调用一次
+        """
+        self._pageCallback = callback
+
+    def run(self):
+        """在守护进程中搜索，引擎失败时抛出RuntimeError
+        """
+        self.loadResults([], [], [])
+        errors = []
+        def write(**record):
+            if record["type"] == "result":
+                self._titleList.append(record["title"])
+                self._descTextList.append(record["desc"])
+                self._hrefList.append(record["href"])
+                if self._pageCallback is not None:
+                    self._pageCallback([record["title"]], [record["desc"]], [record["href"]])
+            elif record["type"] == "engine" and not record["success"]:
+                errors.append(record["error"])
+        self._client.search(self._keyword, [self._engineID], self._passageNum, 0, write)
+        if errors:
+            raise RuntimeError(errors[0])
+
+    def abandon(self):
+        """超时由守护进程计入引擎的健康状况，这里无需处理
+        """
+        pass
+
+    def getPassage(self, index):
+        return self._client.passage(self._engineID, self._hrefList[index])
+
+    def loadResults(self, titleList, descTextList, hrefList):
+        self._titleList = list(titleList)
+        self._descTextList = list(descTextList)
+        self._hrefList = list(hrefList)
+
+    def getTitleList(self):
+        return self._titleList
+
+    def getDescTextList(self):
+        return self._descTextList
+
+    def getHrefList(self):
+        return self._hrefList
@@ -0,0 +1,306 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from RateLimiter import requestPriority, BACKGROUND
+
+class CircuitOpenError(Exception):
+    """引擎已熔断时抛出的异常
+    """
+    pass
+
+class EngineHealth(object):
+    """单个引擎的健康状况与熔断器
+
+    关闭状态下正常请求；最近的失败率超过阈值后打开，打开期间直接跳过该引擎；
+    打开一段时间后进入半开状态，由后台探测一次，成功则关闭，失败则重新打开
+    """
+    CLOSED = "closed" #正常
+    OPEN = "open" #已熔断
+    HALF_OPEN = "halfOpen" #正在探测是否恢复
+
+    def __init__(self, engineID, windowSize=20, minRequests=4, failureThreshold=0.5, openTime=60, smoothing=0.2):
+        self.engineID = engineID
+        self._windowSize = windowSize #统计失败率的最近请求数
+        self._minRequests = minRequests #窗口中至少有这么多请求才会熔断
+        self._failureThreshold = failureThreshold #熔断的失败率阈值
+        self._openTime = openTime #熔断后多久开始探测(秒)
+        self._smoothing = smoothing #耗时指数滑动平均的系数
+        self._lock = threading.Lock()
+        self._outcomes = deque(maxlen=windowSize) #最近请求是否成功
+        self._state = self.CLOSED
+        self._openedAt = None
+        self._latency = None #耗时的滑动平均(秒)
+        self._stats = {"requests":0, "failures":0, "skipped":0, "opened":0, "probes":0}
+
+    def allowRequest(self):
+        """是否允许请求，熔断时计入跳过次数
+
+        Returns:
+            bool: 关闭状态下为True
+        """
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            self._stats["skipped"] += 1
+            return False
+
+    def getState(self):
+        with self._lock:
+            return self._state
+
+    def record(self, success, latency):
+        """记录一次请求的结果
+
+        Args:
+            success (bool): 是否成功
+            latency (float): 耗时(秒)，为None时不计入平均耗时
+
+        Returns:
+            bool: 这次记录是否使熔断器打开
+        """
+        with self._lock:
+            self._stats["requests"] += 1
+            self._stats["failures"] += 0 if success else 1
+            if latency is not None:
+                self._latency = latency if self._latency is None else self._latency * (1 - self._smoothing) + latency * self._smoothing
+            self._outcomes.append(success)
+            if self._state != self.CLOSED:
+                return False
+            failures = self._outcomes.count(False)
+            if len(self._outcomes) >= self._minRequests and failures / len(self._outcomes) >= self._failureThreshold:
+                self._open()
+                return True
+            return False
+
+    def startProbe(self):
+        """进入半开状态，开始探测
+
+        Returns:
+            bool: 是否需要探测，已不处于熔断状态时为False
+        """
+        with self._lock:
+            if self._state != self.OPEN:
+                return False
+            self._state = self.HALF_OPEN
+            self._stats["probes"] += 1
+            return True
+
+    def finishProbe(self, success, latency):
+        """记录探测结果，成功则关闭熔断器，失败则重新打开
+
+        Args:
+            success (bool): 探测是否成功
+            latency (float): 耗时(秒)
+
+        Returns:
+            bool: 熔断器是否重新打开
+        """
+        self.record(success, latency)
+        with self._lock:
+            if success:
+                self._state = self.CLOSED
+                self._outcomes.clear()
+                return False
+            self._open()
+            return True
+
+    def getStats(self):
+        """获取引擎的健康统计
+
+        Returns:
+            dict: 状态、最近失败率、耗时滑动平均(毫秒)以及各类计数
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["state"] = self._state
+            stats["errorRate"] = self._outcomes.count(False) / len(self._outcomes) if self._outcomes else 0.0
+            stats["latencyMs"] = self._latency * 1000 if self._latency is not None else None
+            stats["retryIn"] = max(self._openTime - (time.monotonic() - self._openedAt), 0) if self._state == self.OPEN else 0
+        return stats
+
+    def getOpenTime(self):
+        return self._openTime
+
+    def _open(self):
+        """打开熔断器，需在持有锁时调用
+        """
+        self._state = self.OPEN
+        self._openedAt = time.monotonic()
+        self._stats["opened"] += 1
+
+class CircuitBreaker(object):
+    """所有引擎的熔断器，熔断后在后台定时探测引擎是否恢复
+    """
+    def __init__(self, probeKeyword="python", **healthParams):
+        self._probeKeyword = probeKeyword #探测使用的检索词
+        self._healthParams = healthParams #EngineHealth的参数
+        self._lock = threading.Lock()
+        self._engines = {} #搜索引擎 -> EngineHealth
+        self._crawlerFactory = None #根据搜索引擎构造探测用的爬虫
+
+    def setCrawlerFactory(self, crawlerFactory):
+        """设置构造探测用爬虫的函数
+
+        Args:
+            crawlerFactory (callable): 参数为搜索引擎，返回未包装的爬虫
+        """
+        self._crawlerFactory = crawlerFactory
+
+    def getHealth(self, engineID):
+        """获取引擎的健康状况，不存在时创建
+
+        Args:
+            engineID (str): 搜索引擎
+
+        Returns:
+            EngineHealth: 健康状况
+        """
+        with self._lock:
+            if engineID not in self._engines:
+                self._engines[engineID] = EngineHealth(engineID, **self._healthParams)
+            return self._engines[engineID]
+
+    def allowRequest(self, engineID):
+        return self.getHealth(engineID).allowRequest()
+
+    def getState(self, engineID):
+        return self.getHealth(engineID).getState()
+
+    def record(self, engineID, success, latency):
+        """记录引擎的一次运行结果，熔断时安排后台探测
+
+        Args:
+            engineID (str): 搜索引擎
+            success (bool): 是否成功
+            latency (float): 耗时(秒)，为None时不计入平均耗时
+        """
+        health = self.getHealth(engineID)
+        if health.record(success, latency):
+            self._scheduleProbe(health)
+
+    def getStats(self):
+        """获取所有引擎的健康统计
+
+        Returns:
+            dict: 搜索引擎 -> 统计信息
+        """
+        with self._lock:
+            engines = dict(self._engines)
+        return {engineID:health.getStats() for engineID, health in engines.items()}
+
+    def _scheduleProbe(self, health):
+        timer = threading.Timer(health.getOpenTime(), self._probe, (health,))
+        timer.daemon = True
+        timer.start()
+
+    def _probe(self, health):
+        """在后台线程中用少量文章试探引擎是否恢复
+
+        与正常运行使用相同的规则：运行没有抛出异常(包括错误状态码引起的requests.HTTPError)即为成功，
+        没有结果不算失败
+        """
+        if self._crawlerFactory is None or not health.startProbe():
+            return
+        start = time.monotonic()
+        try:
+            crawler = self._crawlerFactory(health.engineID)
+            crawler.setParam(self._probeKeyword, 1)
+            with requestPriority(BACKGROUND):
+                crawler.run()
+            success = True
+        except Exception:
+            success = False
+        if health.finishProbe(success, time.monotonic() - start):
+            self._scheduleProbe(health)
+
+circuitBreaker = CircuitBreaker() #进程内共享的熔断器
+
+class GuardedCrawler(object):
+    """在爬虫前加上熔断器，运行结果计入引擎的健康状况，其余接口直接转发给被包装的爬虫
+
+    运行抛出异常即为失败，错误状态码的页面由爬虫抛出requests.HTTPError，因此同样计为失败；
+    正常返回但没有结果的运行计为成功，检索词本身可能没有结果
+    """
+    def __init__(self, engineID, crawler, breaker=circuitBreaker):
+        self._engineID = engineID
+        self._crawler = crawler
+        self._breaker = breaker
+        self._abandoned = False
+        self._start = None #第一次开始运行的时间，超时被放弃时用于计算耗时
+
+    def run(self):
+        """运行爬虫，熔断时抛出CircuitOpenError
+        """
+        self._checkCircuit()
+        start = self._markStart()
+        try:
+            self._crawler.run()
+        except Exception:
+            self._record(False, start)
+            raise
+        self._record(True, start)
+
+    def crawlPage(self, pageNum):
+        """单独抓取一页结果，熔断时抛出CircuitOpenError，结果同样计入健康状况
+        """
+        self._checkCircuit()
+        start = self._markStart()
+        try:
+            pageInfo = self._crawler.crawlPage(pageNum)
+        except Exception:
+            self._record(False, start)
+            raise
+        self._record(True, start)
+        return pageInfo
+
+    async def runAsync(self, coroutine):
+        """运行以被包装爬虫为基础的协程(例如AsyncCrawler.run)，结果同样计入健康状况
+
+        Args:
+            coroutine : 运行爬虫的协程
+        """
+        try:
+            self._checkCircuit()
+        except CircuitOpenError:
+            coroutine.close()
+            raise
+        start = self._markStart()
+        try:
+            await coroutine
+        except asyncio.CancelledError: #超时取消由abandon记录
+            raise
+        except Exception:
+            self._record(False, start)
+            raise
+        self._record(True, start)
+
+    def abandon(self):
+        """运行超时被放弃时调用，记为一次失败，耗时为开始运行至今的时间，之后的运行结果不再计入
+        """
+        if not self._abandoned:
+            self._abandoned = True
+            latency = time.monotonic() - self._start if self._start is not None else None #尚未开始时不计入平均耗时
+            self._breaker.record(self._engineID, False, latency)
+
+    def getCrawler(self):
+        """获取被包装的爬虫
+        """
+        return self._crawler
+
+    def __getattr__(self, name):
+        return getattr(self._crawler, name)
+
+    def _checkCircuit(self):
+        if not self._breaker.allowRequest(self._engineID):
+            raise CircuitOpenError("引擎已熔断，暂时跳过")
+
+    def _markStart(self):
+        now = time.monotonic()
+        if self._start is None:
+            self._start = now
+        return now
+
+    def _record(self, success, start):
+        if not self._abandoned:
+            self._breaker.record(self._engineID, success, time.monotonic() - start)
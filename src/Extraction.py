@@ -0,0 +1,91 @@
+"""爬虫共用的页面提取工具
+
+所有XPath在模块导入时编译一次，解析时直接调用编译后的对象；文本由节点的文本片段拼接得到，
+不再对列表的字符串形式做切分与替换，标题中的逗号、引号与空格得以保留
+"""
+from lxml import etree
+
+#博客园
+CNBLOG_ITEMS = etree.XPath("//div[@class='forflow']/div[@class='searchItem']")
+CNBLOG_TITLE = etree.XPath("./h3//text()")
+CNBLOG_DESC = etree.XPath("./span[@class='searchCon']//text()")
+CNBLOG_HREF = etree.XPath("./h3/a/@href")
+CNBLOG_PASSAGE = etree.XPath("//div[@id='cnblogs_post_body']")
+
+#电子发烧友
+ELECFANS_ITEMS = etree.XPath("//div[@class='list']/ul/li")
+ELECFANS_TITLE = etree.XPath("./h2/a//text()")
+ELECFANS_DESC = etree.XPath("./div/p[1]//text()")
+ELECFANS_HREF = etree.XPath("./h2/a/@href")
+ELECFANS_PASSAGE = (etree.XPath("//div[@class='simditor-body clearfix']"), etree.XPath("//div[@id='mainContent']")) #新旧两种文章页面
+
+#CSDN
+CSDN_PASSAGE = etree.XPath("//div[@id='article_content']")
+
+def joinText(texts):
+    """拼接文本片段，并把连续的空白(包括换行)合并为一个空格
+
+    Args:
+        texts (list): XPath返回的文本片段
+
+    Returns:
+        str: 拼接后的文本
+    """
+    return " ".join("".join(texts).split()) #比正则表达式替换快
+
+def removeHighlight(text):
+    """去掉CSDN接口在标题与简述中用<em>标出的检索词高亮
+
+    Args:
+        text (str): 带有<em>标签的文本
+
+    Returns:
+        str: 纯文本
+    """
+    return text.replace("<em>", "").replace("</em>", "")
+
+def extractItems(responseText, items, title, desc, href):
+    """从结果页中提取每条结果的标题、简述与超链接
+
+    Args:
+        responseText (str): 结果页的HTML代码
+        items (etree.XPath): 选出每条结果的XPath
+        title (etree.XPath): 在结果中选出标题文本的XPath
+        desc (etree.XPath): 在结果中选出简述文本的XPath
+        href (etree.XPath): 在结果中选出超链接的XPath
+
+    Returns:
+        tuple: (标题列表,简述列表,超链接列表)，没有超链接的结果被跳过
+    """
+    titleList, descTextList, hrefList = [], [], []
+    tree = etree.HTML(responseText)
+    if tree is None: #空页面
+        return titleList, descTextList, hrefList
+    for item in items(tree):
+        links = href(item)
+        if not links:
+            continue
+        titleList.append(joinText(title(item)))
+        descTextList.append(joinText(desc(item)))
+        hrefList.append(str(links[0]).strip())
+    return titleList, descTextList, hrefList
+
+def extractHtml(htmlResponse, *xpaths):
+    """提取第一个匹配的元素的HTML代码
+
+    Args:
+        htmlResponse (str): 页面的HTML代码
+        xpaths (etree.XPath): 按顺序尝试的XPath
+
+    Returns:
+        str: 元素的HTML代码，不包括元素之后的文本
+
+    Raises:
+        ValueError: 所有XPath都没有匹配的元素
+    """
+    tree = etree.HTML(htmlResponse)
+    for xpath in xpaths:
+        nodes = xpath(tree) if tree is not None else []
+        if nodes:
+            return etree.tostring(nodes[0], method="html", with_tail=False, encoding="unicode")
+    raise ValueError("页面中没有找到文章正文")
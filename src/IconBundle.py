@@ -0,0 +1,217 @@
+"""将图标资源打包为Qt的二进制资源文件(.rcc)
+
+资源文件在运行时由QResource.registerResource注册，Qt直接将文件映射到内存，不需要像资源模块
+那样先编译、反序列化并在Python堆中保存一份完整的数据；打包时只保留界面中实际使用的图标尺寸，
+并且不压缩，使映射的数据可以直接使用
+
+用法：
+    python src/IconBundle.py 输入 [输出]
+    python src/IconBundle.py --compare 旧资源模块 [资源文件]
+输入可以是pyrcc5生成的资源模块(例如旧版本的icons.py)或已有的.rcc文件，输出默认为src/icons.rcc；
+--compare比较导入旧资源模块与注册资源文件的耗时和Python内存，没有安装PyQt5时只比较编译、反序列化与内存
+"""
+import ast
+import marshal
+import statistics
+import struct
+import sys
+import time
+import tracemalloc
+import zlib
+from pathlib import Path
+try:
+    from PyQt5 import QtCore
+except ImportError: #打包与比较的大部分功能不需要PyQt5
+    QtCore = None
+
+KEEP_SIZES = (16, 24, 32, 48, 64, 96) #保留的图标尺寸：托盘与菜单16~32，引擎列表30，搜索栏40，以及它们在高分屏上的两倍
+FLAG_COMPRESSED = 1 #资源树中表示数据经过zlib压缩的标志
+FLAG_DIRECTORY = 2 #资源树中表示目录的标志
+NODE_SIZE = 22 #版本2的资源树中每个节点的字节数
+
+def loadModule(path):
+    """从pyrcc5生成的资源模块中读取资源，不导入模块，因此不需要PyQt5
+
+    Args:
+        path (str): 资源模块路径
+
+    Returns:
+        tuple: (资源树,名称表,数据块)
+    """
+    values = {}
+    for node in ast.parse(Path(path).read_text(encoding="utf-8")).body:
+        if isinstance(node, ast.Assign) and isinstance(node.value, ast.Constant) and isinstance(node.value.value, bytes):
+            values[node.targets[0].id] = node.value.value
+    return values["qt_resource_struct_v2"], values["qt_resource_name"], values["qt_resource_data"]
+
+def loadBundle(path):
+    """从.rcc文件中读取资源
+
+    Args:
+        path (str): 资源文件路径
+
+    Returns:
+        tuple: (资源树,名称表,数据块)
+    """
+    content = Path(path).read_bytes()
+    magic, version, treeOffset, dataOffset, namesOffset = struct.unpack(">4s4I", content[:20])
+    if magic != b"qres" or version != 2:
+        raise ValueError("不支持的资源文件：" + str(path))
+    blocks = sorted([(treeOffset, "tree"), (dataOffset, "data"), (namesOffset, "names"), (len(content), None)])
+    parts = {name:content[offset:blocks[index+1][0]] for index, (offset, name) in enumerate(blocks[:-1])}
+    return parts["tree"], parts["names"], parts["data"]
+
+def filterIco(content, keepSizes=KEEP_SIZES):
+    """只保留ICO文件中指定尺寸的图像
+
+    Args:
+        content (bytes): ICO文件内容
+        keepSizes (tuple, optional): 保留的尺寸
+
+    Returns:
+        bytes: 新的ICO文件内容，没有任何指定尺寸时保留原文件
+    """
+    reserved, kind, count = struct.unpack("<3H", content[:6])
+    if reserved != 0 or kind != 1:
+        return content
+    images = []
+    for index in range(count):
+        entry = content[6+index*16:6+(index+1)*16]
+        width = entry[0] or 256
+        size, offset = struct.unpack("<2I", entry[8:16])
+        if width in keepSizes:
+            images.append((entry[:8], content[offset:offset+size]))
+    if not images:
+        return content
+    header = struct.pack("<3H", 0, 1, len(images))
+    offset = 6 + 16 * len(images)
+    entries, payloads = [], []
+    for entry, payload in images:
+        entries.append(entry + struct.pack("<2I", len(payload), offset))
+        payloads.append(payload)
+        offset += len(payload)
+    return header + b"".join(entries) + b"".join(payloads)
+
+def rebuild(tree, names, data, keepSizes=KEEP_SIZES):
+    """解压所有文件，过滤图标尺寸，生成新的资源树与数据块
+
+    Returns:
+        tuple: (资源树,名称表,数据块,{资源名称:(原大小,新大小)})
+    """
+    tree = bytearray(tree)
+    blocks = []
+    offset = 0
+    report = {}
+    for start in range(0, len(tree), NODE_SIZE):
+        nameOffset, flags = struct.unpack(">IH", tree[start:start+6])
+        if flags & FLAG_DIRECTORY:
+            continue
+        country, language, dataOffset = struct.unpack(">HHI", tree[start+6:start+14])
+        length = struct.unpack(">I", data[dataOffset:dataOffset+4])[0]
+        content = data[dataOffset+4:dataOffset+4+length]
+        if flags & FLAG_COMPRESSED:
+            content = zlib.decompress(content[4:]) #qCompress的前4个字节是解压后的长度
+        name = names[nameOffset+6:nameOffset+6+2*struct.unpack(">H", names[nameOffset:nameOffset+2])[0]].decode("utf-16-be")
+        if name.lower().endswith(".ico"):
+            filtered = filterIco(content, keepSizes)
+            report[name] = (len(content), len(filtered))
+            content = filtered
+        struct.pack_into(">HHHI", tree, start+4, flags & ~FLAG_COMPRESSED, country, language, offset)
+        blocks.append(struct.pack(">I", len(content)) + content)
+        offset += 4 + len(content)
+    return bytes(tree), names, b"".join(blocks), report
+
+def writeBundle(path, tree, names, data):
+    """写入版本2的.rcc文件：文件头、资源树、名称表、数据块
+    """
+    treeOffset = 20
+    namesOffset = treeOffset + len(tree)
+    dataOffset = namesOffset + len(names)
+    header = struct.pack(">4s4I", b"qres", 2, treeOffset, dataOffset, namesOffset)
+    Path(path).write_bytes(header + tree + names + data)
+
+def _median(function, repeat=5):
+    """多次调用取耗时的中位数(毫秒)
+    """
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        durations.append((time.perf_counter() - start) * 1000)
+    return round(statistics.median(durations), 2)
+
+def measureModule(path):
+    """测量导入资源模块时Python端的开销
+
+    Args:
+        path (str): 资源模块路径
+
+    Returns:
+        dict: compileMs为没有.pyc时编译源码的耗时，unmarshalMs为有.pyc时反序列化代码对象的耗时，
+              heapBytes为代码对象(包括其中的图标数据)常驻的Python内存，安装了PyQt5时registerMs为执行模块(注册资源)的耗时
+    """
+    source = Path(path).read_text(encoding="utf-8")
+    code = compile(source, str(path), "exec")
+    cached = marshal.dumps(code)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    loaded = marshal.loads(cached)
+    heapBytes = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    stats = {"fileBytes":Path(path).stat().st_size, "compileMs":_median(lambda: compile(source, str(path), "exec"), 3),
+             "unmarshalMs":_median(lambda: marshal.loads(cached)), "heapBytes":heapBytes}
+    if QtCore is not None:
+        namespace = {"__file__":str(Path(path).resolve())}
+        stats["registerMs"] = _median(lambda: exec(loaded, namespace), 1)
+        namespace["qCleanupResources"]()
+    return stats
+
+def measureBundle(path):
+    """测量注册资源文件的开销，资源文件由Qt映射到内存，不占用Python内存
+
+    Args:
+        path (str): 资源文件路径
+
+    Returns:
+        dict: 安装了PyQt5时registerMs为注册的耗时
+    """
+    stats = {"fileBytes":Path(path).stat().st_size, "heapBytes":0}
+    if QtCore is not None:
+        def register():
+            QtCore.QResource.registerResource(str(path))
+            QtCore.QResource.unregisterResource(str(path))
+        stats["registerMs"] = _median(register)
+    return stats
+
+def compare(modulePath, bundlePath):
+    moduleStats = measureModule(modulePath)
+    loaderPath = Path(bundlePath).with_suffix(".py")
+    loaderStats = measureModule(loaderPath) if loaderPath.exists() else None #注册资源文件的加载模块本身
+    bundleStats = measureBundle(bundlePath)
+    print("旧资源模块{0}：{1}".format(Path(modulePath).name, moduleStats))
+    if loaderStats is not None:
+        print("加载模块{0}：{1}".format(loaderPath.name, loaderStats))
+    print("资源文件{0}：{1}".format(Path(bundlePath).name, bundleStats))
+    if QtCore is None:
+        print("没有安装PyQt5，未测量Qt注册资源的耗时")
+    return 0
+
+def main(argv):
+    if not argv:
+        print(__doc__)
+        return 1
+    if argv[0] == "--compare":
+        return compare(argv[1], argv[2] if len(argv) > 2 else Path(__file__).resolve().with_name("icons.rcc"))
+    source = Path(argv[0])
+    target = Path(argv[1]) if len(argv) > 1 else Path(__file__).resolve().with_name("icons.rcc")
+    tree, names, data = loadBundle(source) if source.suffix == ".rcc" else loadModule(source)
+    tree, names, bundleData, report = rebuild(tree, names, data)
+    writeBundle(target, tree, names, bundleData)
+    for name, (before, after) in sorted(report.items()):
+        print("{0}：{1}字节 -> {2}字节".format(name, before, after))
+    print("输入{0}：{1}字节，其中资源数据{2}字节".format(source.name, source.stat().st_size, len(data)))
+    print("输出{0}：{1}字节".format(target.name, target.stat().st_size))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
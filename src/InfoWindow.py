@@ -56,6 +56,58 @@ class InfoWindow(QWidget):
         self._resultDict = resultDict
         self._searchPage.showDate(resultDict)
         self._mainTab.setCurrentWidget(self._searchPage)
+
+    def appendSearchResults(self, engineID, engineName, icon, results):
+        """追加某个引擎的一页结果，收到第一页结果时即切换到结果页
+
+        Args:
+            engineID (str): 搜索引擎
+            engineName (str): 搜索引擎名称
+            icon (QIcon): 搜索引擎图标
+            results (list): 结果列表，每项为{"title":标题,"desc":简述}
+        """
+        self._searchPage.appendDate(engineID, engineName, icon, results)
+        self._mainTab.setCurrentWidget(self._searchPage)
+
+    def replaceSearchResults(self, engineID, engineName, icon, results):
+        """用新的结果替换某个引擎已显示的结果
+
+        Args:
+            engineID (str): 搜索引擎
+            engineName (str): 搜索引擎名称
+            icon (QIcon): 搜索引擎图标
+            results (list): 结果列表，每项为{"title":标题,"desc":简述}
+        """
+        self._searchPage.replaceDate(engineID, engineName, icon, results)
+        self._mainTab.setCurrentWidget(self._searchPage)
+
+    def setEngineState(self, engineID, engineName, icon, state, tips=""):
+        """在引擎列表中显示引擎的状态(例如等待中)
+
+        Args:
+            engineID (str): 搜索引擎
+            engineName (str): 搜索引擎名称
+            icon (QIcon): 搜索引擎图标
+            state (str): 状态，为空字符串时清除状态
+            tips (str, optional): 引擎的提示信息
+        """
+        self._searchPage.setEngineState(engineID, engineName, icon, state, tips)
+
+    def markEngineFailed(self, engineID, engineName, icon, reason):
+        """将某个引擎标记为失败，已显示的结果保留
+
+        Args:
+            engineID (str): 搜索引擎
+            engineName (str): 搜索引擎名称
+            icon (QIcon): 搜索引擎图标
+            reason (str): 失败原因
+        """
+        self._searchPage.setEngineState(engineID, engineName, icon, "失败", reason)
+
+    def finishSearch(self):
+        """所有引擎完成后的处理，没有任何结果时也切换到结果页
+        """
+        self._mainTab.setCurrentWidget(self._searchPage)
     
     def showPreview(self, title, href, htmlCode, config):
         """显示预览页面
@@ -63,12 +115,16 @@ class InfoWindow(QWidget):
         Args:
             title (str): 标签页标题
             href (str): 文章超链接
-            htmlCode (str): 文章HTML源代码
+            htmlCode (str): 文章HTML源代码，为None时显示加载中，之后通过PreviewTab.setHtml设置
             config (str): 系统默认配置
+
+        Returns:
+            PreviewTab: 新建的预览标签页
         """
         tab = PreviewTab(self, href, htmlCode, config)
         self._tabWidget.addTab(tab, title)
         self._tabWidget.setCurrentWidget(tab)
+        return tab
 
     def _tableCloseHandle(self, currentIndex):
         """标签页的关闭的槽函数
@@ -76,7 +132,11 @@ class InfoWindow(QWidget):
         Args:
             currentIndex (int): 关闭标签的索引
         """
+        tab = self._tabWidget.widget(currentIndex)
         self._tabWidget.removeTab(currentIndex)
+        if isinstance(tab, PreviewTab):
+            tab.closed.emit()
+            tab.deleteLater()
 
 
 class SearchPage(QWidget):
@@ -112,27 +172,85 @@ class SearchPage(QWidget):
         Args:
             resultDict (dict): 存储结果的字典
         """
-        self._resultDict = resultDict
-        self._engineIDs = list(resultDict.keys())
-        for engineID in self._resultDict:
-            icon = self._resultDict[engineID]["icon"]
-            engineName = self._resultDict[engineID]["engineName"]
+        for engineID in resultDict:
+            engine = resultDict[engineID]
+            self.appendDate(engineID, engine["engineName"], engine["icon"], engine["results"])
+
+    def appendDate(self, engineID, engineName, icon, results):
+        """追加某个引擎的结果，新的引擎会被添加到引擎列表的末尾
+
+        Args:
+            engineID (str): 搜索引擎
+            engineName (str): 搜索引擎名称
+            icon (QIcon): 搜索引擎图标
+            results (list): 结果列表，每项为{"title":标题,"desc":简述}
+        """
+        if self._resultDict is None:
+            self._resultDict = {}
+            self._engineIDs = []
+        if engineID not in self._resultDict:
+            self._resultDict[engineID] = {"engineName":engineName,"icon":icon,"results":[]}
+            self._engineIDs.append(engineID)
             engineItem = QListWidgetItem(icon,engineName,self._engineListWidget)
             self._engineListWidget.addItem(engineItem)
-        self._engineListWidget.setCurrentRow(0)
-        self._engineListWidget.itemClicked.emit(self._engineListWidget.item(0))
+        self._resultDict[engineID]["results"].extend(results)
+        if engineID == self._engineNow:
+            self._addResultItems(results)
+        elif results and (self._engineNow is None or not self._resultDict[self._engineNow]["results"]): #第一个返回结果的引擎作为默认显示的引擎
+            row = self._engineIDs.index(engineID)
+            self._engineListWidget.setCurrentRow(row)
+            self._engineChooseHandle(self._engineListWidget.item(row))
+
+    def replaceDate(self, engineID, engineName, icon, results):
+        """替换某个引擎的结果，正在显示该引擎时立即刷新结果列表
+
+        Args:
+            engineID (str): 搜索引擎
+            engineName (str): 搜索引擎名称
+            icon (QIcon): 搜索引擎图标
+            results (list): 结果列表，每项为{"title":标题,"desc":简述}
+        """
+        if self._resultDict is None or engineID not in self._resultDict:
+            self.appendDate(engineID, engineName, icon, results)
+            return
+        self._resultDict[engineID]["results"] = list(results)
+        if engineID == self._engineNow:
+            self._resultListWidget.clear()
+            self._addResultItems(results)
+
+    def setEngineState(self, engineID, engineName, icon, state, tips=""):
+        """在引擎列表中显示引擎的状态，引擎尚未出现时添加到列表末尾
+
+        Args:
+            engineID (str): 搜索引擎
+            engineName (str): 搜索引擎名称
+            icon (QIcon): 搜索引擎图标
+            state (str): 状态，为空字符串时只显示引擎名称
+            tips (str, optional): 引擎的提示信息
+        """
+        if self._resultDict is None or engineID not in self._resultDict:
+            self.appendDate(engineID, engineName, icon, [])
+        item = self._engineListWidget.item(self._engineIDs.index(engineID))
+        item.setText(engineName + "(" + state + ")" if state else engineName)
+        item.setToolTip(tips)
 
     def _engineChooseHandle(self,item):
         self._resultListWidget.clear()
         index = self._engineListWidget.indexFromItem(item).row()
         engineID = self._engineIDs[index]
-        results = self._resultDict[engineID]["results"]
+        self._engineNow = engineID
+        self._addResultItems(self._resultDict[engineID]["results"])
+
+    def _addResultItems(self, results):
+        """在结果列表末尾添加结果
+
+        Args:
+            results (list): 结果列表
+        """
         for result in results:
             item = QListWidgetItem(result["title"],self._resultListWidget)
             item.setToolTip(result["desc"])
             self._resultListWidget.addItem(item)
-        self._engineNow = engineID
-
 
     def _previewHandle(self, item):
         index = self._resultListWidget.indexFromItem(item).row()
@@ -146,6 +264,16 @@ class ProcessPage(QWidget):
         self._tips = tips
         self.setupUi()
     
+    def setTips(self, tips):
+        """修改提示文字并停止进度条
+
+        Args:
+            tips (str): 提示文字
+        """
+        self._tips = tips
+        self._label.setText(tips)
+        self._processBar.setMaximum(1)
+
     def setupUi(self):
         #进度条
         self._processBar = QProgressBar()
@@ -185,6 +313,8 @@ class ProcessPage(QWidget):
 class PreviewTab(QWidget):
     """预览标签页
     """
+    closed = pyqtSignal() #标签页被关闭
+
     def __init__(self, parent, href, htmlCode, config):
         super().__init__(parent)
         self._href = href
@@ -195,8 +325,12 @@ class PreviewTab(QWidget):
 
     def setUpUi(self):
         self._webWidget = QWebEngineView(self) # 用于浏览网页
-        self._webWidget.setHtml(self._htmlCode)
         self._webWidget.setContentsMargins(10,10,10,10)
+        self._processPage = ProcessPage("文章加载中...") #文章加载完成前显示
+        self._stackedWidget = QStackedWidget(self)
+        self._stackedWidget.addWidget(self._processPage)
+        self._stackedWidget.addWidget(self._webWidget)
+        self._stackedWidget.setCurrentWidget(self._processPage)
 
         spacerItem = QSpacerItem(40, 20, QSizePolicy.Expanding, QSizePolicy.Minimum)
         label = QLabel("网页地址：")
@@ -227,13 +361,36 @@ class PreviewTab(QWidget):
         horizontalLayout.addWidget(urlLineEdit)
         horizontalLayout.addWidget(self._pathLineEdit)
         horizontalLayout.addWidget(exportButton)
+        self._exportButton = exportButton
+        self._exportButton.setEnabled(False) #文章加载完成后才能导出
     
         verticalLayout = QVBoxLayout(self)
         #verticalLayout.setContentsMargins(0,0,0,0)
-        verticalLayout.addWidget(self._webWidget)
+        verticalLayout.addWidget(self._stackedWidget)
         verticalLayout.addLayout(horizontalLayout)
         verticalLayout.setStretch(0, 10)
         verticalLayout.setStretch(1, 1)
+        if self._htmlCode is not None:
+            self.setHtml(self._htmlCode)
+
+    def setHtml(self, htmlCode):
+        """设置文章的HTML代码并结束加载状态
+
+        Args:
+            htmlCode (str): 文章HTML源代码
+        """
+        self._htmlCode = htmlCode
+        self._webWidget.setHtml(htmlCode)
+        self._stackedWidget.setCurrentWidget(self._webWidget)
+        self._exportButton.setEnabled(True)
+
+    def showError(self, message):
+        """显示文章加载失败
+
+        Args:
+            message (str): 错误信息
+        """
+        self._processPage.setTips("文章加载失败：" + message)
 
 
     def _copyHandle(self):
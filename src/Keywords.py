@@ -1,8 +1,105 @@
-import requests as rq
 import re
 import json
+import threading
+import time
+from collections import OrderedDict
+from SessionPool import sessionPool
+from SingleFlight import SingleFlight
+
+class KeywordsCache(object):
+    """关键词提示的缓存，保存最近查询过的前缀及其提示列表
+    """
+    def __init__(self, maxEntries=500, ttl=600):
+        self._maxEntries = maxEntries #最多保存的前缀数
+        self._ttl = ttl #提示列表的有效期(秒)
+        self._lock = threading.Lock()
+        self._entries = OrderedDict() #前缀 -> (提示列表,写入时间)
+        self._stats = {"hits":0, "misses":0}
+
+    def get(self, keyword):
+        """读取缓存的提示列表
+
+        Args:
+            keyword (str): 用户输入的关键词
+
+        Returns:
+            list: 提示列表，未命中或已过期时为None
+        """
+        with self._lock:
+            entry = self._entries.get(keyword)
+            if entry is None or time.time() - entry[1] > self._ttl:
+                self._entries.pop(keyword, None)
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(keyword)
+            self._stats["hits"] += 1
+            return list(entry[0])
+
+    def put(self, keyword, keywordsList):
+        """写入提示列表
+
+        Args:
+            keyword (str): 用户输入的关键词
+            keywordsList (list): 提示列表
+        """
+        with self._lock:
+            self._entries.pop(keyword, None)
+            self._entries[keyword] = (list(keywordsList), time.time())
+            while len(self._entries) > self._maxEntries:
+                self._entries.popitem(last=False)
+
+    def getStats(self):
+        """获取缓存的统计信息
+
+        Returns:
+            dict: 命中数、未命中数、命中率与当前条目数
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        total = stats["hits"] + stats["misses"]
+        stats["hitRate"] = stats["hits"] / total if total else 0.0
+        return stats
+
+keywordsCache = KeywordsCache() #进程内共享的关键词提示缓存
+_singleFlight = SingleFlight() #相同前缀的并发请求共享一次网络请求
+_source = None #获取提示的函数，为None时直接访问网络
+
+def setSource(source):
+    """设置获取提示的函数，例如改为从守护进程获取，缓存与请求合并仍然有效
+
+    Args:
+        source (callable): 参数为关键词，返回提示列表，为None时恢复为直接访问网络
+    """
+    global _source
+    _source = source
+
 def getKeywordsList(keyword):
-    """根据输入的关键词进行关键词提示
+    """根据输入的关键词进行关键词提示，优先使用缓存，相同关键词的并发请求只访问一次网络
+
+    Args:
+        keyword (str): 用户输入的关键词
+
+    Returns:
+        list: 百度提示的关键词列表
+    """
+    keywordsList = keywordsCache.get(keyword)
+    if keywordsList is None:
+        keywordsList = _singleFlight.do(keyword, _fetchAndCache, keyword)
+    return keywordsList
+
+def getSingleFlightStats():
+    """获取关键词请求合并的统计信息
+    """
+    return _singleFlight.getStats()
+
+def _fetchAndCache(keyword):
+    keywordsList = (_source or fetchKeywordsList)(keyword)
+    keywordsCache.put(keyword, keywordsList)
+    return keywordsList
+
+def fetchKeywordsList(keyword):
+    """不经过缓存，直接从网络获取关键词提示
 
     Args:
         keyword (str): 用户输入的关键词
@@ -11,11 +108,12 @@ def getKeywordsList(keyword):
         list: 百度提示的关键词列表
     """
     url = "http://suggestion.baidu.com/su?wd={0}&cb=window.baidu.sug".format(keyword)
-    response = rq.get(url)
+    response = sessionPool.get(url, timeout=(3, 3), retries=1) #提示过时就没有意义，超时设置得比较短
+    response.raise_for_status()
     responseText = response.content.decode("gbk")
     keywordsJson = re.findall(r'\[.*\]',responseText)[0]
     keywordsList = json.loads(keywordsJson)
     return keywordsList
 
 if __name__ == '__main__':
-    print(getKeywordsList("python"))
\ No newline at end of file
+    print(getKeywordsList("python"))
@@ -0,0 +1,133 @@
+import json
+import threading
+from pathlib import Path
+
+class KeywordsTrie(object):
+    """由历史搜索词与历史提示构成的前缀树，用于在网络提示返回前立即给出本地补全
+
+    每个节点保存经过该节点的权重最高的若干个词，查询只需沿前缀走到对应节点，
+    耗时只与前缀长度有关
+    """
+    QUERY_WEIGHT = 10 #用户搜索过的词每次增加的权重
+    SUGGESTION_WEIGHT = 1 #网络提示的词每次增加的权重
+
+    def __init__(self, maxEntries=5000, topSize=10):
+        self._maxEntries = maxEntries #最多保存的词数
+        self._topSize = topSize #每个节点保存的候选词数
+        self._lock = threading.Lock()
+        self._weights = {} #词 -> 权重
+        self._root = self._newNode()
+
+    @classmethod
+    def load(cls, path, maxEntries=5000, topSize=10):
+        """从文件载入前缀树，文件不存在或损坏时返回空树
+
+        Args:
+            path (str): 文件路径
+            maxEntries (int, optional): 最多保存的词数
+            topSize (int, optional): 每个节点保存的候选词数
+
+        Returns:
+            KeywordsTrie: 前缀树
+        """
+        trie = cls(maxEntries, topSize)
+        try:
+            with open(str(path), "r", encoding="utf-8") as fp:
+                weights = json.load(fp)
+            for phrase, weight in weights.items():
+                trie._insert(phrase, weight)
+        except Exception:
+            pass
+        return trie
+
+    def save(self, path):
+        """保存到文件，只保存词与权重，载入时重建前缀树
+
+        Args:
+            path (str): 文件路径
+        """
+        with self._lock:
+            weights = dict(self._weights)
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(str(path), "w", encoding="utf-8") as fp:
+            json.dump(weights, fp, ensure_ascii=False, separators=(",", ":"))
+
+    def addQuery(self, phrase):
+        """记录一次用户的搜索
+
+        Args:
+            phrase (str): 搜索词
+        """
+        self.add(phrase, self.QUERY_WEIGHT)
+
+    def addSuggestions(self, phrases):
+        """记录网络返回的提示
+
+        Args:
+            phrases (list): 提示列表
+        """
+        for phrase in phrases:
+            self.add(phrase, self.SUGGESTION_WEIGHT)
+
+    def add(self, phrase, weight):
+        """增加词的权重，词不存在时插入
+
+        Args:
+            phrase (str): 词
+            weight (float): 增加的权重
+        """
+        phrase = phrase.strip()
+        if not phrase:
+            return
+        with self._lock:
+            self._insert(phrase, self._weights.get(phrase, 0) + weight)
+            if len(self._weights) > self._maxEntries:
+                self._rebuild()
+
+    def complete(self, prefix, limit=10):
+        """获取以prefix开头的词，按权重从高到低排列
+
+        Args:
+            prefix (str): 前缀
+            limit (int, optional): 最多返回的词数
+
+        Returns:
+            list: 补全列表
+        """
+        prefix = prefix.strip()
+        if not prefix:
+            return []
+        with self._lock:
+            node = self._root
+            for char in prefix.lower():
+                node = node[0].get(char)
+                if node is None:
+                    return []
+            return [phrase for weight, phrase in node[1][:limit]]
+
+    def __len__(self):
+        return len(self._weights)
+
+    def _newNode(self):
+        return [{}, []] #[子节点,候选词列表]
+
+    def _insert(self, phrase, weight):
+        """插入或更新词，并更新路径上各节点的候选词，需在持有锁时调用
+        """
+        self._weights[phrase] = weight
+        node = self._root
+        for char in phrase.lower():
+            node = node[0].setdefault(char, self._newNode())
+            top = [entry for entry in node[1] if entry[1] != phrase]
+            top.append((weight, phrase))
+            top.sort(key=lambda entry: -entry[0])
+            node[1] = top[:self._topSize]
+
+    def _rebuild(self):
+        """只保留权重最高的词并重建前缀树，需在持有锁时调用
+        """
+        kept = sorted(self._weights.items(), key=lambda item: -item[1])[:self._maxEntries*9//10]
+        self._weights = {}
+        self._root = self._newNode()
+        for phrase, weight in kept:
+            self._insert(phrase, weight)
@@ -0,0 +1,326 @@
+"""爬虫解析代码的微基准测试
+
+对每个引擎的结果页解析(_getInfo)与正文提取(_getPassageHtml)分别计时，页面来自语料目录与内置的合成页面，
+合成页面包括正常大小的页面与5~10MB的病态页面；每个用例输出每秒操作数与一次操作的Python内存分配，
+结果追加到历史文件，并与历史中上一次的同名用例比较，便于发现版本之间的性能退化
+
+语料目录的结构为 语料目录/引擎/results/名称.html(或.json) 与 语料目录/引擎/passages/名称.html，
+可以从Replay.py录制的夹具导入；加上--legacy时同时运行改用Extraction.py之前的解析代码作为对照，
+对照用例的名称以@legacy结尾，当前用例中的speedup为相对对照的加速比
+
+用法：
+    python src/ParserBench.py run [--corpus corpus] [--synthetic 5 10] [-e CSDN] [-t 1.0] [--label 说明] [--legacy]
+    python src/ParserBench.py import fixtures corpus
+内存分配由tracemalloc统计，只包括Python对象，lxml在C中分配的解析树不计算在内
+"""
+import argparse
+import base64
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from urllib.parse import urlsplit
+import lxml
+from lxml import etree
+from CrawlerFactory import CrawlerFactory
+
+RESULTS = "results" #结果页解析
+PASSAGES = "passages" #正文提取
+DEFAULT_HISTORY = Path(__file__).resolve().parent.joinpath("cache", "parserBench.jsonl") #默认的历史文件
+MIN_RUNS = 3 #每个用例至少运行的次数
+REGRESSION = 0.1 #每秒操作数比上一次下降超过该比例时标记为退化
+
+RESULT_HOSTS = {"so.csdn.net":CrawlerFactory.CSDN, "zzk.cnblogs.com":CrawlerFactory.CNBLOG, "s.elecfans.com":CrawlerFactory.ELECFANS} #结果页所在的主机
+PASSAGE_DOMAINS = {"csdn.net":CrawlerFactory.CSDN, "cnblogs.com":CrawlerFactory.CNBLOG, "elecfans.com":CrawlerFactory.ELECFANS} #文章所在的域名
+
+def _resultItem(engineID, index, descLength):
+    """生成一条合成的搜索结果，标题中包含逗号、引号与高亮标签
+    """
+    title = "Python多线程, \"GIL\"与'线程池' 第{0}篇".format(index)
+    desc = ("在Python中使用<em>多线程</em>处理I/O密集的任务, 注意'锁'的开销。" * (descLength // 30 + 1))[:descLength]
+    href = "https://example.com/p/{0}.html".format(index)
+    if engineID == CrawlerFactory.CSDN:
+        return {"title":title.replace("多线程", "<em>多线程</em>"), "description":desc, "url":href}
+    if engineID == CrawlerFactory.CNBLOG:
+        return ('<div class="searchItem"><h3 class="searchItemTitle"><a href="{0}" target="_blank">{1}<strong>python</strong></a></h3>'
+                '<span class="searchCon">\n    {2}\n</span><div class="searchItemInfo"><span>2021-05-01</span></div></div>').format(href, title, desc)
+    return ('<li><h2><a href="{0}">{1}<span class="red">python</span></a></h2><div><p>{2}</p><p>阅读 100</p></div></li>').format(href, title, desc)
+
+def synthesizeResults(engineID, itemCount=None, size=None):
+    """生成合成的结果页
+
+    Args:
+        engineID (str): 搜索引擎
+        itemCount (int, optional): 结果数，默认为该引擎每页的结果数
+        size (int, optional): 页面的目标字节数，指定时不断增加结果直到达到该大小
+
+    Returns:
+        str: 页面内容
+    """
+    itemCount = itemCount or CrawlerFactory.ENGINES[engineID]["passagePerPage"]
+    descLength = 120 if size is None else 2000 #病态页面中每条简述也很长
+    items = []
+    total = 0
+    index = 0
+    while index < itemCount or (size is not None and total < size):
+        item = _resultItem(engineID, index, descLength)
+        items.append(item)
+        total += len(json.dumps(item, ensure_ascii=False).encode("utf-8")) if engineID == CrawlerFactory.CSDN else len(item.encode("utf-8"))
+        index += 1
+    if engineID == CrawlerFactory.CSDN:
+        return json.dumps({"result_vos":items, "total":len(items)}, ensure_ascii=False)
+    body = ('<div class="forflow">{0}</div>' if engineID == CrawlerFactory.CNBLOG else '<div class="list"><ul>{0}</ul></div>').format("".join(items))
+    return "<html><head><title>搜索</title></head><body><div id=\"header\"></div>{0}<div id=\"footer\"></div></body></html>".format(body)
+
+def synthesizePassage(engineID, size=None):
+    """生成合成的文章页面，病态页面的正文很长，并且正文前有大量深层嵌套的无关元素
+
+    Args:
+        engineID (str): 搜索引擎
+        size (int, optional): 页面的目标字节数，默认生成约20KB的正常页面
+
+    Returns:
+        str: 页面内容
+    """
+    size = size or 20000
+    paragraph = "<p>线程之间共享内存, 需要用<code>threading.Lock</code>保护\"共享\"状态。</p><pre><code>with lock:\n    count += 1\n</code></pre>"
+    noise = "<div class=\"sidebar\">" + "<div><a href=\"#\">推荐文章</a>" * 50 + "</div>" * 50 + "</div>"
+    noiseCount = size // 2 // len(noise.encode("utf-8")) if size > 1000000 else 1
+    paragraphCount = max((size - noiseCount * len(noise.encode("utf-8"))) // len(paragraph.encode("utf-8")), 1)
+    container = {CrawlerFactory.CSDN:'<div id="article_content" class="article_content clearfix">{0}</div>',
+                 CrawlerFactory.CNBLOG:'<div id="cnblogs_post_body" class="blogpost-body">{0}</div>',
+                 CrawlerFactory.ELECFANS:'<div class="simditor-body clearfix">{0}</div>'}[engineID]
+    return "<html><head><title>文章</title></head><body>{0}{1}</body></html>".format(noise * noiseCount, container.format(paragraph * paragraphCount))
+
+def loadCorpus(directory, engineIDs):
+    """读取语料目录中的页面
+
+    Returns:
+        list: (引擎,类型,名称,页面内容)
+    """
+    cases = []
+    for engineID in engineIDs:
+        for kind in (RESULTS, PASSAGES):
+            for path in sorted(Path(directory).joinpath(engineID, kind).glob("*")):
+                if path.suffix in (".html", ".json"):
+                    cases.append((engineID, kind, path.stem, path.read_text(encoding="utf-8", errors="replace")))
+    return cases
+
+def importFixtures(fixtureDirectory, corpusDirectory):
+    """把Replay.py录制的夹具按主机分类写入语料目录
+
+    Returns:
+        int: 导入的页面数
+    """
+    count = 0
+    for path in sorted(Path(fixtureDirectory).glob("*/*.json")):
+        fixture = json.loads(path.read_text(encoding="utf-8"))
+        host = urlsplit(fixture["url"]).netloc
+        if host in RESULT_HOSTS:
+            engineID, kind = RESULT_HOSTS[host], RESULTS
+        else:
+            engineID = next((engine for domain, engine in PASSAGE_DOMAINS.items() if host == domain or host.endswith("." + domain)), None)
+            kind = PASSAGES
+        if engineID is None or fixture["status"] != 200:
+            continue
+        charset = fixture["contentType"].split("charset=")[-1].split(";")[0].strip() if "charset=" in fixture["contentType"] else "utf-8"
+        content = base64.b64decode(fixture["content"]).decode(charset, errors="replace")
+        suffix = ".json" if "json" in fixture["contentType"] else ".html"
+        target = Path(corpusDirectory).joinpath(engineID, kind, path.stem + suffix)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_text(content, encoding="utf-8")
+        count += 1
+    return count
+
+def _legacyTostring(node):
+    return etree.tostring(node, method='html', with_tail=False).decode('UTF-8')
+
+def _legacyCnblogInfo(responseText):
+    titleList, descTextList, hrefList = [], [], []
+    for item in etree.HTML(responseText).xpath(".//div[@class='forflow']/div[@class='searchItem']"):
+        title = str(item.xpath("./h3//text()")).split(',')
+        titleName = ''
+        for i in range(1, len(title)-1):
+            titleName += title[i]
+            titleName = titleName.replace("'", "").replace(" ", "")
+        titleList.append(titleName)
+        descTextList.append(str(item.xpath("./span[@class='searchCon']/text()")).replace(r"\n", "").replace(" ", ''))
+        hrefList.append(str(item.xpath("./h3/a/@href")[0]).replace("'", ""))
+    return titleList, descTextList, hrefList
+
+def _legacyElecfansInfo(responseText):
+    titleList, descTextList, hrefList = [], [], []
+    for item in etree.HTML(responseText).xpath('//div[@class="list"]/ul/li'):
+        titleList.append(str(item.xpath("./h2/a//text()")).replace('[', '').replace(']', '').replace("'", '').replace(',', '').replace(' ', ''))
+        descTextList.append(str(item.xpath('./div/p[1]//text()')).replace('[', '').replace(']', '').replace("'", '').replace(',', '').replace(' ', ''))
+        hrefList.append(str(item.xpath("./h2/a/@href")[0]))
+    return titleList, descTextList, hrefList
+
+def _legacyCsdnInfo(responseText):
+    titleList, descTextList, hrefList = [], [], []
+    for item in dict(json.loads(responseText))['result_vos']:
+        titleList.append(str(item['title']).replace('<em>', '').replace('</em>', ''))
+        descTextList.append(str(item['description']).replace('<em>', '').replace('</em>', ''))
+        hrefList.append(str(item['url']))
+    return titleList, descTextList, hrefList
+
+def _legacyPassage(*xpaths):
+    def extract(htmlResponse):
+        htmlTree = etree.HTML(htmlResponse)
+        for xpath in xpaths:
+            nodes = htmlTree.xpath(xpath)
+            if nodes:
+                return _legacyTostring(nodes[0])
+        raise IndexError("list index out of range")
+    return extract
+
+LEGACY_PARSERS = {
+    (CrawlerFactory.CSDN, RESULTS):_legacyCsdnInfo,
+    (CrawlerFactory.CSDN, PASSAGES):_legacyPassage('//div[@id="article_content"]'),
+    (CrawlerFactory.CNBLOG, RESULTS):_legacyCnblogInfo,
+    (CrawlerFactory.CNBLOG, PASSAGES):_legacyPassage('//div[@id="cnblogs_post_body"]'),
+    (CrawlerFactory.ELECFANS, RESULTS):_legacyElecfansInfo,
+    (CrawlerFactory.ELECFANS, PASSAGES):_legacyPassage('//div[@class="simditor-body clearfix"]', '//div[@id ="mainContent"]')
+    } #改用Extraction.py之前每个引擎的解析代码，只用于对照
+
+def getParser(engineID, kind):
+    """获取被测的解析函数
+
+    Returns:
+        callable: 参数为页面内容
+    """
+    crawler = CrawlerFactory.ENGINES[engineID]["class"]()
+    return crawler._getInfo if kind == RESULTS else crawler._getPassageHtml
+
+def measure(function, content, timeBudget):
+    """对一个用例计时并统计内存分配
+
+    Args:
+        function (callable): 解析函数
+        content (str): 页面内容
+        timeBudget (float): 计时的总时长(秒)，至少运行MIN_RUNS次
+
+    Returns:
+        dict: runs为运行次数，opsPerSec为每秒操作数，medianMs为单次耗时的中位数，
+              peakBytes为一次操作中Python内存的峰值增量，retainedBytes为操作返回时仍占用的内存(主要是返回的结果)
+    """
+    function(content) #预热，排除第一次调用的导入与缓存开销
+    durations = []
+    start = time.perf_counter()
+    while len(durations) < MIN_RUNS or time.perf_counter() - start < timeBudget:
+        begin = time.perf_counter()
+        function(content)
+        durations.append(time.perf_counter() - begin)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    tracemalloc.reset_peak()
+    result = function(content)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return {"runs":len(durations), "opsPerSec":round(len(durations) / sum(durations), 2),
+            "medianMs":round(statistics.median(durations) * 1000, 3), "peakBytes":peak - before, "retainedBytes":current - before}
+
+def loadLastRun(historyPath):
+    """读取历史中每个用例最近一次的结果
+
+    Returns:
+        dict: 用例名称 -> 结果
+    """
+    last = {}
+    try:
+        with open(str(historyPath), "r", encoding="utf-8") as fp:
+            for line in fp:
+                try:
+                    for case in json.loads(line)["cases"]:
+                        last[case["name"]] = case
+                except (ValueError, KeyError):
+                    pass
+    except FileNotFoundError:
+        pass
+    return last
+
+def _getVersion():
+    """获取当前代码的版本，不在git仓库中时为None
+    """
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], cwd=str(Path(__file__).resolve().parent),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(args):
+    cases = []
+    for engineID in args.engines:
+        cases.append((engineID, RESULTS, "synthetic", synthesizeResults(engineID)))
+        cases.append((engineID, PASSAGES, "synthetic", synthesizePassage(engineID)))
+        for megabytes in args.synthetic:
+            cases.append((engineID, RESULTS, "synthetic-{0}MB".format(megabytes), synthesizeResults(engineID, size=megabytes*1000000)))
+            cases.append((engineID, PASSAGES, "synthetic-{0}MB".format(megabytes), synthesizePassage(engineID, megabytes*1000000)))
+    if args.corpus:
+        cases.extend(loadCorpus(args.corpus, args.engines))
+    last = loadLastRun(args.history)
+    results = []
+    variants = [("", getParser)]
+    if args.legacy:
+        variants.append(("@legacy", lambda engineID, kind: LEGACY_PARSERS[(engineID, kind)]))
+    for engineID, kind, name, content in cases:
+        for suffix, parserFactory in reversed(variants): #先运行对照，当前用例才能计算加速比
+            results.append(_runCase("{0}/{1}/{2}{3}".format(engineID, kind, name, suffix), parserFactory(engineID, kind), content, args, last, results))
+    record = {"time":time.strftime("%Y-%m-%dT%H:%M:%S"), "version":_getVersion(), "label":args.label,
+              "python":platform.python_version(), "lxml":lxml.__version__, "machine":platform.node(), "cases":results}
+    Path(args.history).parent.mkdir(parents=True, exist_ok=True)
+    with open(str(args.history), "a", encoding="utf-8") as fp:
+        fp.write(json.dumps(record, ensure_ascii=False) + "\n")
+    regressions = [result["name"] for result in results if result.get("regression")]
+    print(json.dumps({"type":"done", "cases":len(results), "regressions":regressions, "history":str(args.history)}, ensure_ascii=False))
+    return 1 if regressions else 0
+
+def _runCase(caseName, parser, content, args, last, results):
+    """运行一个用例，与历史中上一次的结果比较，有对照时计算加速比
+
+    Returns:
+        dict: 用例的结果
+    """
+    try:
+        result = measure(parser, content, args.time)
+    except Exception as e: #页面不符合解析代码的预期，例如语料已过时
+        result = {"error":str(e) or type(e).__name__}
+    result = dict(name=caseName, sizeBytes=len(content.encode("utf-8")), **result)
+    previous = last.get(caseName)
+    if previous and previous.get("opsPerSec") and result.get("opsPerSec"):
+        result["change"] = round(result["opsPerSec"] / previous["opsPerSec"] - 1, 3)
+        result["regression"] = result["change"] < -REGRESSION
+    legacy = results[-1] if results and results[-1]["name"] == caseName + "@legacy" else None
+    if legacy and legacy.get("opsPerSec") and result.get("opsPerSec"):
+        result["speedup"] = round(result["opsPerSec"] / legacy["opsPerSec"], 2)
+    print(json.dumps(dict(type="case", **result), ensure_ascii=False), flush=True)
+    return result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="爬虫解析代码的微基准测试")
+    commands = parser.add_subparsers(dest="command", required=True)
+    runCommand = commands.add_parser("run", help="运行基准测试并记录到历史文件")
+    runCommand.add_argument("--corpus", help="语料目录")
+    runCommand.add_argument("--synthetic", type=int, nargs="*", default=[5, 10], metavar="MB", help="合成病态页面的大小(MB)，默认5与10")
+    runCommand.add_argument("-e", "--engine", dest="engines", action="append", choices=CrawlerFactory.getCrawlerList(), help="搜索引擎，默认使用所有引擎")
+    runCommand.add_argument("-t", "--time", type=float, default=1.0, help="每个用例计时的总时长(秒)")
+    runCommand.add_argument("--history", default=str(DEFAULT_HISTORY), help="历史文件")
+    runCommand.add_argument("--label", help="本次运行的说明，写入历史文件")
+    runCommand.add_argument("--legacy", action="store_true", help="同时运行改用Extraction.py之前的解析代码作为对照")
+    importCommand = commands.add_parser("import", help="从Replay.py录制的夹具导入语料")
+    importCommand.add_argument("fixtures", help="夹具目录")
+    importCommand.add_argument("corpus", help="语料目录")
+    args = parser.parse_args(argv)
+    if args.command == "import":
+        print(json.dumps({"type":"import", "pages":importFixtures(args.fixtures, args.corpus)}, ensure_ascii=False))
+        return 0
+    args.engines = args.engines or CrawlerFactory.getCrawlerList()
+    return run(args)
+
+if __name__ == '__main__':
+    sys.exit(main())
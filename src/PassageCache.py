@@ -0,0 +1,167 @@
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+TRACKING_PARAMS = ("spm", "utm_source", "utm_medium", "utm_campaign", "utm_term", "utm_content", "depth_1-utm_source", "depth_1-utm_medium") #不影响文章内容的跟踪参数
+
+def canonicalizeUrl(url):
+    """将文章地址规范化，同一篇文章的不同写法得到相同的地址
+
+    Args:
+        url (str): 文章地址
+
+    Returns:
+        str: 规范化后的地址
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower() or "http"
+    netloc = parts.netloc.lower()
+    if (scheme == "http" and netloc.endswith(":80")) or (scheme == "https" and netloc.endswith(":443")):
+        netloc = netloc.rsplit(":", 1)[0]
+    query = [(key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True) if key not in TRACKING_PARAMS]
+    query.sort()
+    return urlunsplit((scheme, netloc, parts.path or "/", urlencode(query), ""))
+
+class PassageCache(object):
+    """文章缓存，内存中保存最近使用的文章，磁盘上用SQLite持久化保存，程序重启后仍然有效
+    """
+    def __init__(self, maxMemoryBytes=16*1024*1024, path=None, ttl=7*24*3600, maxDiskBytes=128*1024*1024):
+        self._maxMemoryBytes = maxMemoryBytes #内存缓存的最大字符数
+        self._ttl = ttl #缓存的有效期(秒)
+        self._maxDiskBytes = maxDiskBytes #磁盘缓存的最大字符数
+        self._lock = threading.Lock()
+        self._memory = OrderedDict() #地址 -> (HTML代码,写入时间)
+        self._memoryBytes = 0
+        self._connection = None
+        self._stats = {"memoryHits":0, "diskHits":0, "misses":0}
+        if path is not None:
+            self.setPath(path)
+
+    def setPath(self, path):
+        """设置磁盘缓存的路径，为None时只使用内存缓存
+
+        Args:
+            path (str): SQLite数据库文件路径
+        """
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+            if path is None:
+                return
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            self._connection = sqlite3.connect(str(path), check_same_thread=False)
+            self._connection.execute("CREATE TABLE IF NOT EXISTS passages (url TEXT PRIMARY KEY, html TEXT, size INTEGER, createdAt REAL, accessedAt REAL)")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS passagesAccessedAt ON passages (accessedAt)")
+            self._connection.commit()
+
+    def configure(self, maxMemoryBytes=None, ttl=None, maxDiskBytes=None):
+        """修改缓存参数
+
+        Args:
+            maxMemoryBytes (int, optional): 内存缓存的最大字符数
+            ttl (float, optional): 缓存的有效期(秒)
+            maxDiskBytes (int, optional): 磁盘缓存的最大字符数
+        """
+        with self._lock:
+            self._maxMemoryBytes = maxMemoryBytes if maxMemoryBytes is not None else self._maxMemoryBytes
+            self._ttl = ttl if ttl is not None else self._ttl
+            self._maxDiskBytes = maxDiskBytes if maxDiskBytes is not None else self._maxDiskBytes
+            self._trimMemory()
+
+    def get(self, url):
+        """读取缓存的文章
+
+        Args:
+            url (str): 文章地址
+
+        Returns:
+            str: 文章的HTML代码，未命中或已过期时为None
+        """
+        key = canonicalizeUrl(url)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and now - entry[1] <= self._ttl:
+                self._memory.move_to_end(key)
+                self._stats["memoryHits"] += 1
+                return entry[0]
+            if self._connection is not None:
+                row = self._connection.execute("SELECT html, createdAt FROM passages WHERE url = ?", (key,)).fetchone()
+                if row is not None and now - row[1] <= self._ttl:
+                    self._connection.execute("UPDATE passages SET accessedAt = ? WHERE url = ?", (now, key))
+                    self._connection.commit()
+                    self._putMemory(key, row[0], row[1])
+                    self._stats["diskHits"] += 1
+                    return row[0]
+            self._stats["misses"] += 1
+            return None
+
+    def put(self, url, htmlCode):
+        """写入文章
+
+        Args:
+            url (str): 文章地址
+            htmlCode (str): 文章的HTML代码
+        """
+        key = canonicalizeUrl(url)
+        now = time.time()
+        with self._lock:
+            self._putMemory(key, htmlCode, now)
+            if self._connection is not None:
+                self._connection.execute("INSERT OR REPLACE INTO passages VALUES (?, ?, ?, ?, ?)", (key, htmlCode, len(htmlCode), now, now))
+                self._trimDisk(now)
+                self._connection.commit()
+
+    def getStats(self):
+        """获取缓存的统计信息
+
+        Returns:
+            dict: 内存命中数、磁盘命中数、未命中数、命中率以及各层的占用
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memoryEntries"] = len(self._memory)
+            stats["memoryBytes"] = self._memoryBytes
+            if self._connection is not None:
+                entries, size = self._connection.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM passages").fetchone()
+                stats["diskEntries"] = entries
+                stats["diskBytes"] = size
+        total = stats["memoryHits"] + stats["diskHits"] + stats["misses"]
+        stats["hitRate"] = (stats["memoryHits"] + stats["diskHits"]) / total if total else 0.0
+        return stats
+
+    def _putMemory(self, key, htmlCode, createdAt):
+        """写入内存缓存，需在持有锁时调用
+        """
+        entry = self._memory.pop(key, None)
+        if entry is not None:
+            self._memoryBytes -= len(entry[0])
+        self._memory[key] = (htmlCode, createdAt)
+        self._memoryBytes += len(htmlCode)
+        self._trimMemory()
+
+    def _trimMemory(self):
+        """淘汰最久未使用的文章直至不超过内存预算，需在持有锁时调用
+        """
+        while self._memory and self._memoryBytes > self._maxMemoryBytes:
+            key, entry = self._memory.popitem(last=False)
+            self._memoryBytes -= len(entry[0])
+
+    def _trimDisk(self, now):
+        """删除过期的文章，再按最久未访问的顺序删除直至不超过磁盘预算，需在持有锁时调用
+        """
+        self._connection.execute("DELETE FROM passages WHERE createdAt < ?", (now - self._ttl,))
+        total = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM passages").fetchone()[0]
+        if total <= self._maxDiskBytes:
+            return
+        for url, size in self._connection.execute("SELECT url, size FROM passages ORDER BY accessedAt").fetchall():
+            if total <= self._maxDiskBytes:
+                break
+            self._connection.execute("DELETE FROM passages WHERE url = ?", (url,))
+            total -= size
+
+passageCache = PassageCache() #进程内共享的文章缓存，设置路径后启用磁盘缓存
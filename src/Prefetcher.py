@@ -0,0 +1,123 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, CancelledError
+from RateLimiter import requestPriority, BACKGROUND
+
+class PassagePrefetcher(object):
+    """在后台预先下载排名靠前的文章，使第一次预览也能立即打开
+
+    预取任务在独立的小线程池中排队执行，不会占用搜索与预览的线程；
+    开始新的搜索时调用cancel丢弃上一次搜索的预取
+    """
+    def __init__(self, topK=3, concurrency=2, maxEntries=100):
+        self._topK = topK #每个引擎预取的文章数，为0时不预取
+        self._concurrency = concurrency #同时预取的最大文章数
+        self._maxEntries = maxEntries #最多保存的预取结果数
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=concurrency)
+        self._futures = OrderedDict() #超链接 -> Future
+        self._generation = 0 #每次取消后加一，旧的预取任务不再执行
+        self._stats = {"prefetched":0, "hits":0, "inflightHits":0, "misses":0, "cancelled":0}
+
+    def configure(self, topK=None, concurrency=None):
+        """修改预取参数
+
+        Args:
+            topK (int, optional): 每个引擎预取的文章数
+            concurrency (int, optional): 同时预取的最大文章数
+        """
+        with self._lock:
+            if topK is not None:
+                self._topK = topK
+            if concurrency is not None and concurrency != self._concurrency:
+                self._concurrency = concurrency
+                self._executor.shutdown(wait=False)
+                self._executor = ThreadPoolExecutor(max_workers=concurrency)
+
+    def prefetch(self, crawler):
+        """预取爬虫当前结果中排名前topK的文章，已预取的文章不会重复下载
+
+        Args:
+            crawler (AbstractCrawler): 已有结果的爬虫
+        """
+        hrefList = crawler.getHrefList()
+        with self._lock:
+            for index in range(min(self._topK, len(hrefList))):
+                href = hrefList[index]
+                if href in self._futures:
+                    continue
+                self._futures[href] = self._executor.submit(self._fetch, crawler, index, self._generation)
+                self._evict()
+
+    def getPassage(self, crawler, index):
+        """获取文章，优先使用预取的结果，会阻塞调用线程
+
+        Args:
+            crawler (AbstractCrawler): 爬虫
+            index (int): 文章索引
+
+        Returns:
+            str: 文章的HTML代码
+        """
+        href = crawler.getHrefList()[index]
+        with self._lock:
+            future = self._futures.get(href)
+            if future is not None and future.cancel(): #还在排队，直接下载比等待更快
+                del self._futures[href]
+                future = None
+            if future is not None:
+                key = "hits" if future.done() else "inflightHits"
+        if future is not None:
+            try:
+                htmlCode = future.result()
+                if htmlCode is not None:
+                    self._count(key)
+                    return htmlCode
+            except (Exception, CancelledError):
+                pass
+        self._count("misses")
+        return crawler.getPassage(index)
+
+    def cancel(self):
+        """取消所有预取，并丢弃已预取的结果
+        """
+        with self._lock:
+            self._generation += 1
+            for future in self._futures.values():
+                if future.cancel():
+                    self._stats["cancelled"] += 1
+            self._futures.clear()
+
+    def getStats(self):
+        """获取预取的统计信息
+
+        Returns:
+            dict: prefetched为完成的预取数，hits为命中已完成预取的次数，inflightHits为等待进行中预取的次数，
+                  misses为未命中的次数，cancelled为被取消的预取数，hitRate为命中率
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        total = stats["hits"] + stats["inflightHits"] + stats["misses"]
+        stats["hitRate"] = (stats["hits"] + stats["inflightHits"]) / total if total else 0.0
+        return stats
+
+    def _fetch(self, crawler, index, generation):
+        """预取任务，所属的搜索已被取消时直接返回None，限流时排在用户的请求之后
+        """
+        if generation != self._generation:
+            return None
+        with requestPriority(BACKGROUND):
+            htmlCode = crawler.getPassage(index)
+        self._count("prefetched")
+        return htmlCode
+
+    def _evict(self):
+        """超出容量时丢弃最早的预取，需在持有锁时调用
+        """
+        while len(self._futures) > self._maxEntries:
+            href, future = self._futures.popitem(last=False)
+            future.cancel()
+
+    def _count(self, key):
+        with self._lock:
+            self._stats[key] += 1
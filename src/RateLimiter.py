@@ -0,0 +1,182 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+
+INTERACTIVE = 0 #用户正在等待的请求，例如搜索、预览与关键词提示
+BACKGROUND = 1 #后台请求，例如预取与熔断探测
+
+_priority = contextvars.ContextVar("requestPriority", default=INTERACTIVE) #当前线程或协程发出请求的优先级
+
+@contextmanager
+def requestPriority(priority):
+    """在with块内以指定优先级发送请求
+
+    Args:
+        priority (int): INTERACTIVE或BACKGROUND
+    """
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+def getRequestPriority():
+    return _priority.get()
+
+class RateLimiter(object):
+    """按主机划分的令牌桶限流器，所有爬虫、文章下载与关键词提示共享
+
+    令牌按固定速率补充，最多积累burst个；没有令牌时请求排队等待，
+    交互请求排在后台请求之前，同一优先级按到达顺序获得令牌
+    """
+    def __init__(self, rate=5, burst=10):
+        self._rate = rate #每个主机每秒补充的令牌数，为0时不限流
+        self._burst = burst #每个主机最多积累的令牌数
+        self._hostLimits = {} #主机 -> (速率,突发数)，覆盖默认设置
+        self._condition = threading.Condition()
+        self._buckets = {} #主机 -> [令牌数,上次补充的时间]
+        self._waiters = {} #主机 -> 等待令牌的(优先级,序号)堆
+        self._sequence = itertools.count()
+        self._stats = {} #(主机,优先级) -> {"requests":请求数,"waited":等待过的请求数,"totalWait":总等待时间,"maxWait":最长等待时间}
+
+    def configure(self, rate=None, burst=None):
+        """修改默认的限流参数
+
+        Args:
+            rate (float, optional): 每个主机每秒补充的令牌数，为0时不限流
+            burst (int, optional): 每个主机最多积累的令牌数
+        """
+        with self._condition:
+            self._rate = rate if rate is not None else self._rate
+            self._burst = burst if burst is not None else self._burst
+            self._condition.notify_all()
+
+    def configureHost(self, host, rate, burst):
+        """为某个主机单独设置限流参数
+
+        Args:
+            host (str): 主机，形如https://so.csdn.net
+            rate (float): 每秒补充的令牌数，为0时不限流
+            burst (int): 最多积累的令牌数
+        """
+        with self._condition:
+            self._hostLimits[host] = (rate, burst)
+            self._condition.notify_all()
+
+    def acquire(self, host, priority=None):
+        """获取一个令牌，没有令牌时阻塞等待
+
+        Args:
+            host (str): 主机
+            priority (int, optional): 优先级，默认使用requestPriority设置的优先级
+
+        Returns:
+            float: 等待的时间(秒)
+        """
+        priority = getRequestPriority() if priority is None else priority
+        start = time.monotonic()
+        with self._condition:
+            ticket = self._enqueue(host, priority)
+            while True:
+                delay = self._tryTake(host, ticket)
+                if delay == 0:
+                    break
+                self._condition.wait(delay)
+            return self._record(host, priority, start)
+
+    async def acquireAsync(self, host, priority=None):
+        """acquire的协程版本，等待时不阻塞事件循环
+
+        Args:
+            host (str): 主机
+            priority (int, optional): 优先级，默认使用requestPriority设置的优先级
+
+        Returns:
+            float: 等待的时间(秒)
+        """
+        priority = getRequestPriority() if priority is None else priority
+        start = time.monotonic()
+        with self._condition:
+            ticket = self._enqueue(host, priority)
+        try:
+            while True:
+                with self._condition:
+                    delay = self._tryTake(host, ticket)
+                    if delay == 0:
+                        return self._record(host, priority, start)
+                #排在队首时等到下一个令牌补充；排在其他请求(可能来自其他线程，无法唤醒协程)之后时定时检查
+                await asyncio.sleep(0.05 if delay is None else delay)
+        except asyncio.CancelledError:
+            with self._condition:
+                self._removeTicket(host, ticket)
+            raise
+
+    def getStats(self):
+        """获取限流的等待统计
+
+        Returns:
+            dict: 主机 -> {"interactive"/"background": {requests,waited,avgWaitMs,maxWaitMs}}
+        """
+        names = {INTERACTIVE:"interactive", BACKGROUND:"background"}
+        with self._condition:
+            stats = {}
+            for (host, priority), entry in self._stats.items():
+                stats.setdefault(host, {})[names.get(priority, str(priority))] = {
+                    "requests":entry["requests"], "waited":entry["waited"],
+                    "avgWaitMs":entry["totalWait"] / entry["requests"] * 1000, "maxWaitMs":entry["maxWait"] * 1000}
+            return stats
+
+    def _enqueue(self, host, priority):
+        """加入等待队列，需在持有锁时调用
+        """
+        ticket = (priority, next(self._sequence))
+        heapq.heappush(self._waiters.setdefault(host, []), ticket)
+        return ticket
+
+    def _tryTake(self, host, ticket):
+        """排在队首且有令牌时取走令牌，需在持有锁时调用
+
+        Returns:
+            float: 成功时为0，否则为建议的等待时间(秒)，为None时需等待其他请求唤醒
+        """
+        rate, burst = self._hostLimits.get(host, (self._rate, self._burst))
+        waiters = self._waiters[host]
+        if rate <= 0: #不限流
+            self._removeTicket(host, ticket)
+            return 0
+        now = time.monotonic()
+        bucket = self._buckets.setdefault(host, [burst, now])
+        bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+        bucket[1] = now
+        if waiters[0] != ticket:
+            return None
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            self._removeTicket(host, ticket)
+            return 0
+        return (1 - bucket[0]) / rate
+
+    def _removeTicket(self, host, ticket):
+        """移出等待队列并唤醒其他等待者，需在持有锁时调用
+        """
+        waiters = self._waiters[host]
+        waiters.remove(ticket)
+        heapq.heapify(waiters)
+        self._condition.notify_all()
+
+    def _record(self, host, priority, start):
+        """记录等待时间，需在持有锁时调用
+        """
+        wait = time.monotonic() - start
+        entry = self._stats.setdefault((host, priority), {"requests":0, "waited":0, "totalWait":0.0, "maxWait":0.0})
+        entry["requests"] += 1
+        entry["waited"] += 1 if wait > 0.001 else 0
+        entry["totalWait"] += wait
+        entry["maxWait"] = max(entry["maxWait"], wait)
+        return wait
+
+rateLimiter = RateLimiter() #进程内共享的限流器
@@ -0,0 +1,383 @@
+"""离线的HTTP录制与回放，用于在没有网络的环境中得到可重复的端到端耗时
+
+录制时在连接池上挂载响应钩子，把真实的响应写入夹具目录，每个响应一个JSON文件：
+    夹具目录/主机/请求摘要.json  {"method":方法,"url":地址,"status":状态码,"contentType":类型,"content":Base64内容,"elapsedMs":原始耗时}
+回放时启动本地服务器，连接池的地址映射把 https://so.csdn.net/路径 改写为 http://127.0.0.1:端口/https/so.csdn.net/路径，
+服务器按方法、地址与请求体找到夹具，按每个主机设置的延迟与带宽返回内容；限流仍按原来的主机进行
+
+用法：
+    python src/Replay.py record 夹具目录 "python 多线程" "pyqt5" [-e CSDN] [-n 20] [-p 3]
+    python src/Replay.py serve 夹具目录 [--port 8766] [--latency so.csdn.net=120] [--bandwidth 200000]
+    python src/Replay.py bench 夹具目录 "python 多线程" "pyqt5" [-e CSDN] [-n 20] [-r 5] [--latency 50]
+--latency与--bandwidth的值为"主机=数值"时只作用于该主机，只有数值时作为默认值；
+延迟的单位为毫秒，带宽的单位为字节/秒，0表示不限制
+"""
+import argparse
+import base64
+import hashlib
+import json
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlsplit
+import requests
+from SessionPool import sessionPool
+
+DEFAULT_PORT = 8766 #回放服务器默认监听的端口
+CHUNK_SIZE = 16384 #限制带宽时每次写入的字节数
+
+def prepareUrl(url):
+    """按requests的规则编码地址，录制与回放时使用相同的形式
+
+    Args:
+        url (str): 地址，可以包含未编码的中文
+
+    Returns:
+        str: 编码后的地址
+    """
+    return requests.Request("GET", url).prepare().url
+
+def getFixtureKey(method, url, body=None):
+    """计算请求对应的夹具文件名
+
+    Args:
+        method (str): 请求方法
+        url (str): 编码后的地址
+        body (bytes, optional): 请求体
+
+    Returns:
+        str: 请求摘要
+    """
+    digest = hashlib.sha1("{0} {1}\n".format(method.upper(), url).encode("utf-8"))
+    digest.update(body or b"")
+    return digest.hexdigest()[:20]
+
+class Recorder(object):
+    """把连接池收到的响应录制为夹具，可作为上下文管理器使用
+    """
+    def __init__(self, directory, pool=sessionPool):
+        """
+        Args:
+            directory (str): 夹具目录
+            pool (SessionPool, optional): 录制的连接池
+        """
+        self._directory = Path(directory)
+        self._pool = pool
+        self._lock = threading.Lock()
+        self._count = 0 #已录制的响应数
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.stop()
+
+    def start(self):
+        self._pool.addResponseHook(self.record)
+
+    def stop(self):
+        self._pool.removeResponseHook(self.record)
+
+    def getCount(self):
+        return self._count
+
+    def record(self, response):
+        """录制一个响应，发生重定向时以最初的请求作为键
+
+        Args:
+            response (requests.Response): 响应
+        """
+        request = (response.history[0] if response.history else response).request
+        body = request.body.encode("utf-8") if isinstance(request.body, str) else request.body
+        parts = urlsplit(request.url)
+        fixture = {"method":request.method, "url":request.url, "status":response.status_code,
+                   "contentType":response.headers.get("Content-Type", "application/octet-stream"),
+                   "content":base64.b64encode(response.content).decode("ascii"),
+                   "elapsedMs":round(response.elapsed.total_seconds()*1000)}
+        path = self._directory.joinpath(parts.netloc, getFixtureKey(request.method, request.url, body) + ".json")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(fixture, ensure_ascii=False, indent=1), encoding="utf-8")
+        with self._lock:
+            self._count += 1
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    """按请求行中的原地址查找夹具，找不到时返回404
+    """
+    protocol_version = "HTTP/1.1" #与真实服务器一样保持长连接，连接池的行为才具有可比性
+    disable_nagle_algorithm = True #响应头与内容分开写入，否则延迟确认会给每个响应随机增加约40毫秒
+
+    def do_GET(self):
+        self._replay()
+
+    def do_POST(self):
+        self._replay()
+
+    def log_message(self, format, *args): #不在标准错误中输出每个请求
+        pass
+
+    def _replay(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else None
+        _, scheme, rest = self.path.split("/", 2) if self.path.count("/") >= 2 else ("", "", "")
+        url = scheme + "://" + rest
+        host = urlsplit(url).netloc
+        fixture = self.server.getFixture(self.command, url, body)
+        if fixture is None:
+            content = json.dumps({"error":"没有录制的响应", "method":self.command, "url":url}, ensure_ascii=False).encode("utf-8")
+            status, contentType = 404, "application/json; charset=utf-8"
+        else:
+            content = base64.b64decode(fixture["content"])
+            status, contentType = fixture["status"], fixture["contentType"]
+        latency, bandwidth = self.server.getProfile(host)
+        time.sleep(latency / 1000)
+        self.send_response(status)
+        self.send_header("Content-Type", contentType)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        chunkSize = CHUNK_SIZE if bandwidth else max(len(content), 1)
+        for start in range(0, len(content), chunkSize):
+            chunk = content[start:start+chunkSize]
+            self.wfile.write(chunk)
+            if bandwidth:
+                time.sleep(len(chunk) / bandwidth)
+        self.server.countRequest(fixture is not None, len(content))
+
+class ReplayServer(ThreadingHTTPServer):
+    """回放夹具的本地服务器，每个主机可以设置不同的延迟与带宽
+    """
+    daemon_threads = True
+
+    def __init__(self, directory, host="127.0.0.1", port=DEFAULT_PORT, latency=0, bandwidth=0):
+        """
+        Args:
+            directory (str): 夹具目录
+            host (str, optional): 监听的地址
+            port (int, optional): 监听的端口，为0时由系统分配
+            latency (float, optional): 默认的首字节延迟(毫秒)
+            bandwidth (int, optional): 默认的带宽(字节/秒)，为0时不限制
+        """
+        self._directory = Path(directory)
+        self._latency = latency
+        self._bandwidth = bandwidth
+        self._profiles = {} #主机 -> (延迟,带宽)，覆盖默认设置
+        self._fixtures = {} #请求摘要 -> 夹具，按需读取
+        self._lock = threading.Lock()
+        self._stats = {"hits":0, "misses":0, "bytes":0}
+        super().__init__((host, port), ReplayHandler)
+
+    def getUrl(self):
+        """获取服务器的地址，形如http://127.0.0.1:8766
+        """
+        return "http://{0}:{1}".format(*self.server_address[:2])
+
+    def setProfile(self, host, latency=None, bandwidth=None):
+        """为某个主机单独设置延迟与带宽，未指定的项使用默认值
+
+        Args:
+            host (str): 主机，形如so.csdn.net
+            latency (float, optional): 首字节延迟(毫秒)
+            bandwidth (int, optional): 带宽(字节/秒)，为0时不限制
+        """
+        current = self.getProfile(host)
+        with self._lock:
+            self._profiles[host] = (current[0] if latency is None else latency, current[1] if bandwidth is None else bandwidth)
+
+    def getProfile(self, host):
+        with self._lock:
+            return self._profiles.get(host, (self._latency, self._bandwidth))
+
+    def getFixture(self, method, url, body=None):
+        """查找请求对应的夹具
+
+        Returns:
+            dict: 夹具，没有录制时为None
+        """
+        key = getFixtureKey(method, url, body)
+        with self._lock:
+            if key in self._fixtures:
+                return self._fixtures[key]
+        path = self._directory.joinpath(urlsplit(url).netloc, key + ".json")
+        fixture = json.loads(path.read_text(encoding="utf-8")) if path.exists() else None
+        with self._lock:
+            self._fixtures[key] = fixture
+        return fixture
+
+    def countRequest(self, hit, size):
+        with self._lock:
+            self._stats["hits" if hit else "misses"] += 1
+            self._stats["bytes"] += size
+
+    def getStats(self):
+        """获取统计信息
+
+        Returns:
+            dict: hits为命中夹具的请求数，misses为没有夹具的请求数，bytes为返回的字节数
+        """
+        with self._lock:
+            return dict(self._stats)
+
+    def start(self):
+        """在后台线程中处理请求
+
+        Returns:
+            ReplayServer: 自身
+        """
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+class ReplayMapper(object):
+    """连接池的地址映射，把请求改写到回放服务器
+    """
+    def __init__(self, url):
+        """
+        Args:
+            url (str): 回放服务器的地址，形如http://127.0.0.1:8766
+        """
+        self._url = url.rstrip("/")
+
+    def __call__(self, url):
+        if url.startswith(self._url): #已经是回放服务器的地址
+            return url
+        scheme, rest = prepareUrl(url).split("://", 1)
+        return "{0}/{1}/{2}".format(self._url, scheme, rest)
+
+def replayThrough(url, pool=sessionPool):
+    """之后的所有请求都发往回放服务器
+
+    Args:
+        url (str): 回放服务器的地址，为None时恢复直接访问
+        pool (SessionPool, optional): 连接池
+    """
+    pool.setUrlMapper(ReplayMapper(url) if url else None)
+
+def _parseProfiles(values):
+    """解析--latency与--bandwidth的值
+
+    Returns:
+        tuple: (默认值,{主机:数值})
+    """
+    default, hosts = 0, {}
+    for value in values or []:
+        if "=" in value:
+            host, number = value.split("=", 1)
+            hosts[host] = float(number)
+        else:
+            default = float(value)
+    return default, hosts
+
+def _createServer(args, port):
+    latency, hostLatency = _parseProfiles(args.latency)
+    bandwidth, hostBandwidth = _parseProfiles(args.bandwidth)
+    server = ReplayServer(args.directory, port=port, latency=latency, bandwidth=bandwidth)
+    for host, value in hostLatency.items():
+        server.setProfile(host, latency=value)
+    for host, value in hostBandwidth.items():
+        server.setProfile(host, bandwidth=value)
+    return server
+
+def _crawl(engineID, keyword, passageNum, passages=0):
+    """不经过熔断器运行一个引擎，用于录制与计时
+
+    Returns:
+        AbstractCrawler: 运行后的爬虫
+    """
+    from CrawlerFactory import CrawlerFactory
+    crawler = CrawlerFactory.ENGINES[engineID]["class"]()
+    crawler.setParam(keyword, passageNum)
+    crawler.run()
+    for index in range(min(passages, len(crawler.getHrefList()))):
+        crawler.getPassage(index)
+    return crawler
+
+def record(args):
+    from Keywords import fetchKeywordsList
+    with Recorder(args.directory) as recorder:
+        for keyword in args.keywords:
+            fetchKeywordsList(keyword)
+            for engineID in args.engines:
+                crawler = _crawl(engineID, keyword, args.num, args.passages)
+                print("{0} {1}：{2}条结果".format(engineID, keyword, len(crawler.getHrefList())), file=sys.stderr)
+    print(json.dumps({"type":"record", "directory":args.directory, "responses":recorder.getCount()}, ensure_ascii=False))
+    return 0
+
+def serve(args):
+    server = _createServer(args, args.port)
+    print("回放服务器已启动：{0}".format(server.getUrl()), file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+def bench(args):
+    """在本进程中启动回放服务器，多次运行搜索并统计耗时，不需要网络
+    """
+    from Crawler import AbstractCrawler
+    from Keywords import fetchKeywordsList
+    server = _createServer(args, 0).start()
+    replayThrough(server.getUrl())
+    AbstractCrawler.configureRateLimit(0) #只测量爬虫与服务器，不受限流影响
+    timings = {} #任务 -> 每次成功的耗时(毫秒)
+    errors = {} #任务 -> 失败次数，通常是没有录制对应的响应
+    def measure(name, function, *args):
+        start = time.perf_counter()
+        try:
+            function(*args)
+        except Exception:
+            errors[name] = errors.get(name, 0) + 1
+            return
+        timings.setdefault(name, []).append((time.perf_counter()-start)*1000)
+    try:
+        for _ in range(args.repeat):
+            for keyword in args.keywords:
+                measure("keywords", fetchKeywordsList, keyword)
+                for engineID in args.engines:
+                    measure(engineID, _crawl, engineID, keyword, args.num)
+    finally:
+        replayThrough(None)
+        server.shutdown()
+        server.server_close()
+    for name in sorted(set(timings) | set(errors)):
+        values = timings.get(name, [])
+        timing = {"type":"timing", "name":name, "runs":len(values), "errors":errors.get(name, 0)}
+        if values:
+            timing.update(minMs=round(min(values), 1), medianMs=round(statistics.median(values), 1), maxMs=round(max(values), 1))
+        print(json.dumps(timing, ensure_ascii=False))
+    stats = server.getStats()
+    print(json.dumps(dict(type="server", **stats), ensure_ascii=False))
+    return 0 if not errors and stats["misses"] == 0 else 1
+
+def main(argv=None):
+    from CrawlerFactory import CrawlerFactory
+    parser = argparse.ArgumentParser(description="离线的HTTP录制与回放")
+    commands = parser.add_subparsers(dest="command", required=True)
+    for name, handler in (("record", record), ("serve", serve), ("bench", bench)):
+        command = commands.add_parser(name)
+        command.set_defaults(handler=handler)
+        command.add_argument("directory", help="夹具目录")
+        if name == "serve":
+            command.add_argument("--port", type=int, default=DEFAULT_PORT, help="监听的端口")
+        else:
+            command.add_argument("keywords", nargs="+", help="检索词")
+            command.add_argument("-e", "--engine", dest="engines", action="append", choices=CrawlerFactory.getCrawlerList(), help="搜索引擎，默认使用所有引擎")
+            command.add_argument("-n", "--num", type=int, default=10, help="每个引擎的文章数")
+        if name == "record":
+            command.add_argument("-p", "--passages", type=int, default=0, help="每个引擎录制排名前多少的文章")
+        else:
+            command.add_argument("--latency", action="append", help="首字节延迟(毫秒)，形如120或so.csdn.net=120")
+            command.add_argument("--bandwidth", action="append", help="带宽(字节/秒)，形如200000或so.csdn.net=200000")
+        if name == "bench":
+            command.add_argument("-r", "--repeat", type=int, default=5, help="重复次数")
+    args = parser.parse_args(argv)
+    if getattr(args, "keywords", None) is not None:
+        args.engines = args.engines or CrawlerFactory.getCrawlerList()
+    return args.handler(args)
+
+if __name__ == '__main__':
+    sys.exit(main())
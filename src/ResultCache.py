@@ -0,0 +1,105 @@
+import threading
+import time
+from collections import OrderedDict
+
+def normalizeKeyword(keyword):
+    """规范化检索词，忽略大小写与多余的空白
+
+    Args:
+        keyword (str): 检索词
+
+    Returns:
+        str: 规范化后的检索词
+    """
+    return " ".join(keyword.split()).lower()
+
+class ResultCache(object):
+    """搜索结果缓存，以(搜索引擎,检索词,文章数)为键
+
+    有效期内的结果为新鲜结果，可以直接使用；超过有效期但未超过过期期限的结果为陈旧结果，
+    可以先显示，同时在后台重新搜索并替换
+    """
+    FRESH = "fresh" #新鲜结果
+    STALE = "stale" #陈旧结果
+
+    def __init__(self, maxEntries=200, ttl=600, staleTtl=24*3600):
+        self._maxEntries = maxEntries #最多保存的结果数
+        self._ttl = ttl #新鲜结果的有效期(秒)
+        self._staleTtl = staleTtl #陈旧结果的最长保存时间(秒)
+        self._lock = threading.Lock()
+        self._entries = OrderedDict() #键 -> (标题列表,简述列表,超链接列表,写入时间)
+        self._stats = {"freshHits":0, "staleHits":0, "misses":0}
+
+    def configure(self, maxEntries=None, ttl=None, staleTtl=None):
+        """修改缓存参数
+
+        Args:
+            maxEntries (int, optional): 最多保存的结果数
+            ttl (float, optional): 新鲜结果的有效期(秒)
+            staleTtl (float, optional): 陈旧结果的最长保存时间(秒)
+        """
+        with self._lock:
+            self._maxEntries = maxEntries if maxEntries is not None else self._maxEntries
+            self._ttl = ttl if ttl is not None else self._ttl
+            self._staleTtl = staleTtl if staleTtl is not None else self._staleTtl
+            self._trim()
+
+    def get(self, engineID, keyword, passageNum):
+        """读取缓存的结果
+
+        Args:
+            engineID (str): 搜索引擎
+            keyword (str): 检索词
+            passageNum (int): 文章数
+
+        Returns:
+            tuple: (状态,结果)，状态为FRESH、STALE或None，结果为(标题列表,简述列表,超链接列表)，未命中时为None
+        """
+        key = (engineID, normalizeKeyword(keyword), passageNum)
+        with self._lock:
+            entry = self._entries.get(key)
+            age = time.time() - entry[3] if entry is not None else None
+            if entry is None or age > self._staleTtl:
+                self._entries.pop(key, None)
+                self._stats["misses"] += 1
+                return None, None
+            self._entries.move_to_end(key)
+            state = self.FRESH if age <= self._ttl else self.STALE
+            self._stats["freshHits" if state == self.FRESH else "staleHits"] += 1
+            return state, (list(entry[0]), list(entry[1]), list(entry[2]))
+
+    def put(self, engineID, keyword, passageNum, titleList, descTextList, hrefList):
+        """写入结果
+
+        Args:
+            engineID (str): 搜索引擎
+            keyword (str): 检索词
+            passageNum (int): 文章数
+            titleList (list): 标题列表
+            descTextList (list): 简述列表
+            hrefList (list): 超链接列表
+        """
+        key = (engineID, normalizeKeyword(keyword), passageNum)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (list(titleList), list(descTextList), list(hrefList), time.time())
+            self._trim()
+
+    def getStats(self):
+        """获取缓存的统计信息
+
+        Returns:
+            dict: 新鲜命中数、陈旧命中数、未命中数、命中率与当前条目数
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        total = stats["freshHits"] + stats["staleHits"] + stats["misses"]
+        stats["hitRate"] = (stats["freshHits"] + stats["staleHits"]) / total if total else 0.0
+        return stats
+
+    def _trim(self):
+        """淘汰最久未使用的结果，需在持有锁时调用
+        """
+        while len(self._entries) > self._maxEntries:
+            self._entries.popitem(last=False)
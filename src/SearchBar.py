@@ -1,8 +1,10 @@
+import time
+from collections import deque
 from typing import Text
 from PyQt5.QtWidgets import QAction, QWidget, QLineEdit, QHBoxLayout, QSizePolicy, QApplication, QPushButton, QMenu, QCompleter
-from PyQt5.QtCore import Qt, QSize, pyqtSignal, QTimer, QThread, QEvent
+from PyQt5.QtCore import Qt, QSize, pyqtSignal, QTimer, QEvent, QObject, QRunnable, QThreadPool
 from PyQt5.QtGui import QFont, QIcon, QStandardItemModel
-from Keywords import getKeywordsList
+from Keywords import getKeywordsList, keywordsCache
 import icons
 
 class SearchBar(QWidget):
@@ -10,15 +12,14 @@ class SearchBar(QWidget):
     """
     comfirmSearch = pyqtSignal(tuple) #回车键按下时会发送该信号
     activationChange = pyqtSignal() #活动窗口改变
-    def __init__(self, width=1000, height=50, checkTime = 500):
+    def __init__(self, width=1000, height=50, checkTime = 500, trie = None):
         super().__init__()
+        self._trie = trie #本地前缀树，为None时只使用网络提示
+        self._maxCompletions = 10 #补全列表的最大长度
         self.setWindowIcon(QIcon(":/src/engineIcon/searchAll.ico"))
         self._width = width #窗口宽度
         self._height = height #窗口高度
-        self._checkTime = checkTime #关键字提示刷新事件
-        self._timer = QTimer()
-        self._timer.start()
-        self._timer.timeout.connect(self._timer.stop)
+        self._checkTime = checkTime #关键字提示的基础防抖时间(毫秒)
         self._setupUi()
 
     def _setupUi(self):
@@ -43,7 +44,10 @@ class SearchBar(QWidget):
         self._searchLineEdit.textEdited.connect(self._textEditedHandle)
         #补全
         self._task = GetKeywords()
-        self._task.keywordsGot.connect(self.setCompleterString)
+        self._task.keywordsGot.connect(self._keywordsGotHandle)
+        self._debouncer = Debouncer(self._checkTime) #停止输入后才请求网络提示
+        self._debouncer.triggered.connect(self._task.getKeywords)
+        self._task.latencyMeasured.connect(self._debouncer.reportLatency)
 
         #添加控件
         self._horizontalLayout.addWidget(self._button)
@@ -79,9 +83,32 @@ class SearchBar(QWidget):
         Args:
             text (QString): 当前的文本
         """
-        if not self._timer.isActive():
-            self._task.getKeywords(str(text))
-            self._timer.start(self._checkTime)
+        text = str(text)
+        if self._trie is not None: #本地补全立即显示
+            self.setCompleterString(self._trie.complete(text, self._maxCompletions))
+        self._debouncer.call(text)
+
+    def getSuggestionStats(self):
+        """获取关键词提示的统计信息
+
+        Returns:
+            dict: debounce为防抖的统计，requests为提示请求的统计
+        """
+        return {"debounce":self._debouncer.getStats(), "requests":self._task.getStats()}
+
+    def _keywordsGotHandle(self, keywords):
+        """网络提示返回后的槽函数，与本地补全合并后显示
+
+        Args:
+            keywords (list): 网络提示列表
+        """
+        if self._trie is None:
+            self.setCompleterString(keywords)
+            return
+        self._trie.addSuggestions(keywords)
+        localKeywords = self._trie.complete(self._searchLineEdit.text(), self._maxCompletions)
+        merged = localKeywords + [keyword for keyword in keywords if keyword not in localKeywords]
+        self.setCompleterString(merged[:self._maxCompletions])
     
     def _clearText(self):
         """清除编辑框的文字
@@ -92,6 +119,8 @@ class SearchBar(QWidget):
         """回车按下的槽函数
         """
         text = self._searchLineEdit.text() 
+        if self._trie is not None:
+            self._trie.addQuery(text)
         self._clearText()
         self.comfirmSearch.emit((self._getSearchEngine(),text))
     
@@ -249,19 +278,204 @@ class Engine(QAction):
         self.searchEngineID = searchEngineID
         self.searchEngineName = searchEngineName
 
-class GetKeywords(QThread):
-    """多线程爬取关键词，爬取完成后会发射信号
+class Debouncer(QObject):
+    """尾沿触发的防抖调度器，停止输入一段时间后才以最后一次的文字触发
+
+    等待时间根据用户的按键间隔与提示请求的耗时自适应调整：打字越快、网络越慢，等待越久
     """
-    keywordsGot = pyqtSignal(list)
-    def __init__(self):
+    triggered = pyqtSignal(str, float) #(最后一次的文字,该次按键的时间)
+
+    def __init__(self, delay=300, minDelay=100, maxDelay=1000, smoothing=0.3):
         super().__init__()
+        self._baseDelay = delay #没有测量数据时的等待时间(毫秒)
+        self._minDelay = minDelay
+        self._maxDelay = maxDelay
+        self._smoothing = smoothing #指数滑动平均的系数
+        self._keyInterval = None #按键间隔的滑动平均(毫秒)
+        self._latency = None #提示请求耗时的滑动平均(毫秒)
+        self._lastCallTime = None
+        self._pendingText = None
+        self._stats = {"calls":0, "sent":0}
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._fire)
+
+    def call(self, text):
+        """记录一次输入，重新开始计时
+
+        Args:
+            text (str): 当前的文字
+        """
+        now = time.perf_counter()
+        if self._lastCallTime is not None:
+            interval = (now - self._lastCallTime) * 1000
+            if interval < self._maxDelay * 2: #长时间停顿不计入按键间隔
+                self._keyInterval = self._average(self._keyInterval, interval)
+        self._lastCallTime = now
+        self._pendingText = text
+        self._stats["calls"] += 1
+        self._timer.start(int(self.currentDelay()))
+
+    def reportLatency(self, seconds):
+        """报告一次提示请求的耗时
+
+        Args:
+            seconds (float): 耗时(秒)
+        """
+        self._latency = self._average(self._latency, seconds * 1000)
+
+    def currentDelay(self):
+        """计算当前的等待时间
+
+        Returns:
+            float: 等待时间(毫秒)
+        """
+        delay = self._baseDelay if self._keyInterval is None else self._keyInterval * 1.5 #略长于平时的按键间隔
+        if self._latency is not None:
+            delay += self._latency * 0.5 #请求越慢，越不值得发出中间结果的请求
+        return min(max(delay, self._minDelay), self._maxDelay)
+
+    def getStats(self):
+        """获取防抖的统计信息
+
+        Returns:
+            dict: calls为输入次数，sent为实际触发次数，saved为节省的请求数，以及当前的等待时间(毫秒)
+        """
+        stats = dict(self._stats)
+        stats["saved"] = stats["calls"] - stats["sent"] - (1 if self._timer.isActive() else 0)
+        stats["delayMs"] = self.currentDelay()
+        return stats
+
+    def _average(self, average, value):
+        return value if average is None else average * (1 - self._smoothing) + value * self._smoothing
 
-    def getKeywords(self,text):
+    def _fire(self):
+        self._stats["sent"] += 1
+        self.triggered.emit(self._pendingText, self._lastCallTime)
+
+class KeywordsTask(QRunnable):
+    """获取一次关键词提示的任务
+    """
+    def __init__(self, requestID, text, owner):
+        super().__init__()
+        self.setAutoDelete(False) #由GetKeywords持有引用，避免被取消后重复释放
+        self._requestID = requestID
         self._text = text
-        self.start()
+        self._owner = owner
 
     def run(self):
-        keywords = getKeywordsList(self._text)
+        if self._owner.isSuperseded(self._requestID): #开始执行前已被更新的请求取代
+            self._owner.resultGot.emit(self._requestID, None)
+            return
+        try:
+            keywords = getKeywordsList(self._text)
+        except Exception:
+            keywords = None
+        self._owner.resultGot.emit(self._requestID, keywords)
+
+class GetKeywords(QObject):
+    """多线程爬取关键词，爬取完成后会发射信号
+
+    每次请求都有单调递增的编号，可以同时有多个请求在进行；被新请求取代的排队请求会被取消，
+    比已显示的结果更早的响应会被丢弃，保证补全列表不会被旧前缀的结果覆盖
+    """
+    keywordsGot = pyqtSignal(list)
+    resultGot = pyqtSignal(int, object) #内部信号，(请求编号,提示列表)，失败或取消时为None
+    latencyMeasured = pyqtSignal(float) #一次网络请求从发起到显示的耗时(秒)，不包括防抖等待，用于调整防抖的等待时间
+
+    def __init__(self, maxInFlight=4):
+        super().__init__()
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(maxInFlight) #同时进行的最大请求数
+        self._lastRequestID = 0 #最新请求的编号
+        self._lastShownID = 0 #最新已显示结果的编号
+        self._tasks = {} #请求编号 -> 尚未返回的任务
+        self._requestTimes = {} #请求编号 -> (按键的时间,发起请求的时间)
+        self._latencies = deque(maxlen=200) #最近的从按键到显示提示的耗时(秒)，包括防抖等待
+        self._requestLatencies = deque(maxlen=200) #最近的从发起请求到显示提示的耗时(秒)
+        self._stats = {"requests":0, "cacheHits":0, "sent":0, "cancelled":0, "dropped":0, "failed":0, "shown":0}
+        self.resultGot.connect(self._resultGotHandle)
+
+    def getKeywords(self, text, keystrokeTime=None):
+        """发起一次关键词提示请求，缓存中已有的前缀直接发射信号，不再访问网络
+
+        Args:
+            text (str): 用户输入的关键词
+            keystrokeTime (float, optional): 输入该文字的按键时间(time.perf_counter)，默认为发起请求的时间
+        """
+        self._lastRequestID += 1
+        requestID = self._lastRequestID
+        now = time.perf_counter()
+        self._requestTimes[requestID] = (now if keystrokeTime is None else keystrokeTime, now)
+        self._stats["requests"] += 1
+        self._cancelSuperseded()
+        keywords = keywordsCache.get(text)
+        if keywords is not None:
+            self._stats["cacheHits"] += 1
+            self._show(requestID, keywords)
+            return
+        task = KeywordsTask(requestID, text, self)
+        self._tasks[requestID] = task
+        self._stats["sent"] += 1
+        self._pool.start(task)
+
+    def isSuperseded(self, requestID):
+        """请求是否已被更新的请求取代，可在任意线程中调用
+
+        Args:
+            requestID (int): 请求编号
+        """
+        return requestID < self._lastRequestID
+
+    def getStats(self):
+        """获取提示请求的统计信息
+
+        Returns:
+            dict: 各类请求数，latencyAvgMs与latencyP90Ms为从按键到显示提示(包括防抖等待)的平均耗时与90分位耗时(毫秒)，
+                  requestLatencyAvgMs与requestLatencyP90Ms为从发起请求到显示提示的平均耗时与90分位耗时(毫秒)
+        """
+        stats = dict(self._stats)
+        stats["inFlight"] = len(self._tasks)
+        for prefix, values in (("latency", self._latencies), ("requestLatency", self._requestLatencies)):
+            latencies = sorted(values)
+            stats[prefix + "AvgMs"] = sum(latencies) / len(latencies) * 1000 if latencies else 0.0
+            stats[prefix + "P90Ms"] = latencies[int(len(latencies) * 0.9)] * 1000 if latencies else 0.0
+        return stats
+
+    def _cancelSuperseded(self):
+        """取消仍在排队的旧请求，正在进行的旧请求返回后会被丢弃
+        """
+        for requestID in list(self._tasks):
+            if self._pool.tryTake(self._tasks[requestID]):
+                del self._tasks[requestID]
+                self._requestTimes.pop(requestID, None)
+                self._stats["cancelled"] += 1
+
+    def _resultGotHandle(self, requestID, keywords):
+        """任务返回结果的槽函数，运行在界面线程中
+        """
+        if self._tasks.pop(requestID, None) is None:
+            return
+        if keywords is None:
+            self._stats["failed" if not self.isSuperseded(requestID) else "cancelled"] += 1
+            self._requestTimes.pop(requestID, None)
+            return
+        if requestID < self._lastShownID: #比已显示的结果更旧
+            self._stats["dropped"] += 1
+            self._requestTimes.pop(requestID, None)
+            return
+        self.latencyMeasured.emit(time.perf_counter() - self._requestTimes[requestID][1])
+        self._show(requestID, keywords)
+
+    def _show(self, requestID, keywords):
+        self._lastShownID = requestID
+        now = time.perf_counter()
+        keystrokeTime, requestTime = self._requestTimes.pop(requestID)
+        self._latencies.append(now - keystrokeTime)
+        self._requestLatencies.append(now - requestTime)
+        for oldID in [oldID for oldID in self._requestTimes if oldID < requestID]: #更旧的请求已不会再显示
+            del self._requestTimes[oldID]
+        self._stats["shown"] += 1
         self.keywordsGot.emit(keywords)
 
 
@@ -0,0 +1,244 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlsplit
+from CrawlerFactory import CrawlerFactory
+from Crawler import AbstractCrawler
+from Keywords import getKeywordsList, keywordsCache
+from KeywordsTrie import KeywordsTrie
+from PassageCache import passageCache
+from ResultCache import ResultCache
+
+MAX_RESULT_HREFS = 5000 #记住的最近搜索结果中的文章地址数
+
+def configureBackend(configuration):
+    """按配置设置所有爬虫共享的连接池、限流器与文章缓存
+
+    Args:
+        configuration (dict): 配置，各项的含义与图形界面的配置相同
+    """
+    AbstractCrawler.configurePool(configuration["poolSize"], configuration["poolIdleTimeout"])
+    AbstractCrawler.configureTimeout(configuration["connectTimeout"], configuration["readTimeout"], configuration["retries"])
+    AbstractCrawler.configureRateLimit(configuration["rateLimit"], configuration["rateBurst"])
+    AbstractCrawler.configurePassageCache(configuration.get("passageCachePath"))
+
+class JsonLinesWriter(object):
+    """线程安全地输出JSON行，可直接作为SearchService.search的输出函数
+    """
+    def __init__(self, stream, ensureAscii=False):
+        self._stream = stream
+        self._ensureAscii = ensureAscii
+        self._lock = threading.Lock()
+
+    def __call__(self, **record):
+        self.write(**record)
+
+    def write(self, **record):
+        line = json.dumps(record, ensure_ascii=self._ensureAscii)
+        with self._lock:
+            self._stream.write(line + "\n")
+            self._stream.flush()
+
+class SearchService(object):
+    """不依赖PyQt5的搜索服务，命令行与守护进程共用
+
+    搜索结果以记录的形式逐条交给输出函数，每个引擎解析完一页就输出该页的结果：
+        {"type":"result","engine":引擎,"rank":排名,"title":标题,"desc":简述,"href":超链接}
+        {"type":"passage","engine":引擎,"rank":排名,"href":超链接,"html":文章HTML代码}
+        {"type":"engine","engine":引擎,"success":是否成功,"error":失败原因,"results":结果数,"elapsedMs":耗时,"cached":是否来自缓存}
+    """
+    def __init__(self, configuration):
+        """
+        Args:
+            configuration (dict): 配置，各项的含义与图形界面的配置相同
+        """
+        self._config = configuration
+        configureBackend(configuration)
+        self._resultCache = ResultCache(configuration.get("resultCacheSize", 200), configuration.get("resultCacheTTL", 600))
+        self._trie = KeywordsTrie.load(configuration["keywordsTriePath"]) if configuration.get("keywordsTriePath") else KeywordsTrie()
+        self._resultHrefs = OrderedDict() #最近搜索结果中的文章地址 -> 搜索引擎，按输出顺序淘汰
+        self._hrefLock = threading.Lock()
+
+    def search(self, keyword, engineIDs=None, passageNum=None, passages=0, write=None):
+        """同时运行多个引擎，新鲜的缓存结果直接输出，超过期限的引擎被标记为失败并计入引擎的健康状况
+
+        超过期限的引擎的线程无法被终止，之后它产生的记录都被丢弃；本方法返回后所有引擎的记录都被丢弃，
+        因此输出函数在返回后不会再被调用
+
+        Args:
+            keyword (str): 检索词
+            engineIDs (list, optional): 搜索引擎，默认使用所有引擎
+            passageNum (int, optional): 每个引擎的文章数，默认使用配置中的passageNum
+            passages (int, optional): 每个引擎下载排名前多少的文章
+            write (callable): 输出函数，以关键字参数接收一条记录，可能在多个线程中同时调用
+
+        Returns:
+            bool: 是否所有引擎都在期限内成功完成
+        """
+        engineIDs = engineIDs or CrawlerFactory.getCrawlerList()
+        passageNum = passageNum or self._config["passageNum"]
+        self._trie.addQuery(keyword)
+        threads = {}
+        crawlers = {}
+        stopEvents = {engineID:threading.Event() for engineID in engineIDs} #设置后丢弃该引擎之后的记录
+        lock = threading.Lock() #保证超时记录是该引擎的最后一条记录
+        outcomes = {} #搜索引擎 -> 是否成功
+        def getWriter(engineID):
+            def guardedWrite(**record):
+                with lock:
+                    if not stopEvents[engineID].is_set():
+                        write(**record)
+            return guardedWrite
+        def target(engineID):
+            success = self._runEngine(engineID, crawlers[engineID], keyword, passageNum, passages, getWriter(engineID), stopEvents[engineID])
+            with lock:
+                if not stopEvents[engineID].is_set(): #超时后完成的结果不改变搜索的结果
+                    outcomes[engineID] = success
+        for engineID in engineIDs:
+            crawlers[engineID] = CrawlerFactory.getCrawler(engineID, self._config["concurrentPages"])
+            thread = threading.Thread(target=target, args=(engineID,), daemon=True)
+            thread.start()
+            threads[engineID] = thread
+        deadline = time.monotonic() + self._config["crawlerDeadline"]
+        try:
+            for engineID, thread in threads.items():
+                thread.join(max(deadline - time.monotonic(), 0))
+                if thread.is_alive(): #守护线程不会阻止进程退出
+                    crawlers[engineID].abandon() #超时计入引擎的健康状况，之后的运行结果不再计入
+                    with lock:
+                        stopEvents[engineID].set()
+                        outcomes[engineID] = False
+                        write(type="engine", engine=engineID, success=False, results=None, cached=False,
+                              error="超过{0}秒未完成".format(self._config["crawlerDeadline"]), elapsedMs=None)
+        finally:
+            with lock:
+                for stopEvent in stopEvents.values():
+                    stopEvent.set()
+        return all(outcomes.get(engineID, False) for engineID in engineIDs)
+
+    def suggest(self, keyword, limit=10):
+        """获取智能提示，本地前缀树的补全在前，网络提示在后
+
+        Args:
+            keyword (str): 用户输入的关键词
+            limit (int, optional): 最多返回的提示数
+
+        Returns:
+            list: 提示列表
+        """
+        suggestions = self._trie.complete(keyword, limit)
+        try:
+            remote = getKeywordsList(keyword)
+        except Exception: #网络提示失败时只返回本地补全
+            remote = []
+        self._trie.addSuggestions(remote)
+        for phrase in remote:
+            if phrase not in suggestions:
+                suggestions.append(phrase)
+        return suggestions[:limit]
+
+    def passage(self, engineID, href):
+        """获取文章正文的HTML代码，优先从文章缓存中读取
+
+        只获取该引擎域名下的地址或最近搜索结果中该引擎的地址，避免守护进程被用作访问任意地址的代理
+
+        Args:
+            engineID (str): 文章所属的搜索引擎，决定正文的提取方式
+            href (str): 文章地址
+
+        Returns:
+            str: 文章正文的HTML代码
+
+        Raises:
+            PermissionError: 地址不属于该引擎
+        """
+        if not self.isPassageAllowed(engineID, href):
+            raise PermissionError("只能获取{0}的文章".format(CrawlerFactory.ENGINES[engineID]["searchEngineName"]))
+        crawler = CrawlerFactory.getCrawler(engineID, False)
+        crawler.loadResults([""], [""], [href])
+        return crawler.getPassage(0)
+
+    def isPassageAllowed(self, engineID, href):
+        """地址是否可以作为该引擎的文章获取
+
+        Args:
+            engineID (str): 搜索引擎
+            href (str): 文章地址
+
+        Returns:
+            bool: 地址是该引擎域名下使用默认端口的http(s)地址，或出现在最近该引擎的搜索结果中
+        """
+        parts = urlsplit(href)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            return False
+        domain = CrawlerFactory.ENGINES[engineID]["domain"]
+        if (parts.hostname == domain or parts.hostname.endswith("." + domain)) and parts.port is None and not parts.username:
+            return True
+        with self._hrefLock:
+            return self._resultHrefs.get(href) == engineID
+
+    def getStats(self):
+        """获取各个共享组件的统计信息
+
+        Returns:
+            dict: 连接池、限流、请求合并、引擎健康与各级缓存的统计
+        """
+        return {"pool":AbstractCrawler.getPoolStats(), "rateLimit":AbstractCrawler.getRateLimitStats(), "coalesce":AbstractCrawler.getCoalesceStats(),
+                "health":CrawlerFactory.getHealthStats(), "resultCache":self._resultCache.getStats(),
+                "passageCache":passageCache.getStats(), "keywordsCache":keywordsCache.getStats(), "keywords":len(self._trie)}
+
+    def save(self):
+        """保存需要持久化的数据
+        """
+        if self._config.get("keywordsTriePath"):
+            self._trie.save(self._config["keywordsTriePath"])
+
+    def _runEngine(self, engineID, crawler, keyword, passageNum, passages, write, stopEvent):
+        """运行一个引擎并输出结果，在独立的线程中调用，超过期限后不再下载文章
+
+        Returns:
+            bool: 是否成功
+        """
+        start = time.monotonic()
+        ranks = [0] #已输出的结果数
+        def pageCallback(titleList, descTextList, hrefList):
+            self._rememberHrefs(engineID, hrefList)
+            for title, desc, href in zip(titleList, descTextList, hrefList):
+                write(type="result", engine=engineID, rank=ranks[0], title=title, desc=desc, href=href)
+                ranks[0] += 1
+        crawler.setParam(keyword, passageNum)
+        state, cached = self._resultCache.get(engineID, keyword, passageNum)
+        if state == ResultCache.FRESH:
+            crawler.loadResults(*cached)
+            pageCallback(*cached)
+        else:
+            crawler.setPageCallback(pageCallback)
+            try:
+                crawler.run()
+            except Exception as e:
+                write(type="engine", engine=engineID, success=False, error=str(e) or type(e).__name__,
+                      results=ranks[0], elapsedMs=round((time.monotonic()-start)*1000), cached=False)
+                return False
+            if crawler.getHrefList(): #与图形界面一致，不缓存空结果，被限流或出错的引擎不会在有效期内一直返回没有结果
+                self._resultCache.put(engineID, keyword, passageNum, crawler.getTitleList(), crawler.getDescTextList(), crawler.getHrefList())
+        for index, href in enumerate(crawler.getHrefList()[:passages]):
+            if stopEvent.is_set():
+                return False
+            try:
+                write(type="passage", engine=engineID, rank=index, href=href, html=crawler.getPassage(index))
+            except Exception as e:
+                write(type="passage", engine=engineID, rank=index, href=href, error=str(e) or type(e).__name__)
+        write(type="engine", engine=engineID, success=True, error=None, results=ranks[0],
+              elapsedMs=round((time.monotonic()-start)*1000), cached=state == ResultCache.FRESH)
+        return True
+
+    def _rememberHrefs(self, engineID, hrefList):
+        """记住搜索结果中的文章地址，之后允许通过passage获取
+        """
+        with self._hrefLock:
+            for href in hrefList:
+                self._resultHrefs[href] = engineID
+                self._resultHrefs.move_to_end(href)
+            while len(self._resultHrefs) > MAX_RESULT_HREFS:
+                self._resultHrefs.popitem(last=False)
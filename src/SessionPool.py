@@ -0,0 +1,269 @@
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from RateLimiter import rateLimiter
+
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS") #默认允许重试的请求方法
+RETRY_STATUS = (429, 500, 502, 503, 504) #需要重试的响应状态码
+
+def getBackoff(attempt, backoff, maxBackoff):
+    """计算第attempt次重试前的等待时间，指数增长并加入随机抖动，避免大量请求同时重试
+
+    Args:
+        attempt (int): 重试次数，从0开始
+        backoff (float): 基础等待时间(秒)
+        maxBackoff (float): 最长等待时间(秒)
+
+    Returns:
+        float: 等待时间(秒)
+    """
+    return random.uniform(0, min(maxBackoff, backoff * 2 ** attempt))
+
+def raiseForStatus(status, reason, url):
+    """与requests.Response.raise_for_status相同，供没有requests响应对象的asyncio连接池使用
+
+    Args:
+        status (int): 响应状态码
+        reason (str): 状态说明
+        url (str): 响应的地址
+
+    Raises:
+        requests.HTTPError: 状态码为4xx或5xx
+    """
+    if 400 <= status < 600:
+        raise requests.HTTPError("{0} {1} Error: {2} for url: {3}".format(status, "Client" if status < 500 else "Server", reason, url))
+
+class SessionPool(object):
+    """按主机划分的HTTP长连接池，所有爬虫与关键词提示共享，用于复用TCP/TLS连接
+
+    所有请求都带有连接与读取超时，幂等请求在连接失败、超时或服务器错误时按指数退避重试；
+    每次发送(包括重试)前先从限流器获取对应主机的令牌；
+    可以设置地址映射将请求发往回放服务器，并通过响应钩子录制真实的响应
+    """
+    def __init__(self, poolSize=10, idleTimeout=60, connectTimeout=5, readTimeout=10, retries=2, backoff=0.5, maxBackoff=4, limiter=rateLimiter):
+        self._poolSize = poolSize #每个主机保持的最大连接数
+        self._idleTimeout = idleTimeout #主机连接空闲多久后被回收(秒)
+        self._connectTimeout = connectTimeout #建立连接的超时时间(秒)
+        self._readTimeout = readTimeout #读取响应的超时时间(秒)
+        self._retries = retries #幂等请求的最大重试次数
+        self._backoff = backoff #第一次重试前的基础等待时间(秒)
+        self._maxBackoff = maxBackoff #重试前的最长等待时间(秒)
+        self._limiter = limiter #按主机限流，为None时不限流
+        self._urlMapper = None #将请求地址映射到其他地址(例如回放服务器)的函数
+        self._responseHooks = [] #收到最终响应后调用的函数(例如录制响应)
+        self._lock = threading.Lock()
+        self._sessions = {} #主机 -> requests.Session
+        self._lastUsed = {} #主机 -> 最后一次使用的时间
+        self._inUse = {} #主机 -> 正在进行的请求数，正在使用的会话不会被回收
+        self._requestCount = {} #主机 -> 累计请求数
+        self._closedConnections = {} #主机 -> 已回收会话中新建过的连接数
+
+    def configure(self, poolSize=None, idleTimeout=None):
+        """修改连接池参数，修改连接数后已有的空闲会话会被关闭并按新参数重建
+
+        Args:
+            poolSize (int, optional): 每个主机的最大连接数
+            idleTimeout (float, optional): 空闲回收时间(秒)
+        """
+        with self._lock:
+            if idleTimeout is not None:
+                self._idleTimeout = idleTimeout
+            if poolSize is not None and poolSize != self._poolSize:
+                self._poolSize = poolSize
+                for host in list(self._sessions):
+                    if not self._inUse.get(host):
+                        self._closeSession(host)
+
+    def configureTimeout(self, connectTimeout=None, readTimeout=None, retries=None, backoff=None):
+        """修改超时与重试参数
+
+        Args:
+            connectTimeout (float, optional): 建立连接的超时时间(秒)
+            readTimeout (float, optional): 读取响应的超时时间(秒)
+            retries (int, optional): 幂等请求的最大重试次数
+            backoff (float, optional): 第一次重试前的基础等待时间(秒)
+        """
+        with self._lock:
+            self._connectTimeout = connectTimeout if connectTimeout is not None else self._connectTimeout
+            self._readTimeout = readTimeout if readTimeout is not None else self._readTimeout
+            self._retries = retries if retries is not None else self._retries
+            self._backoff = backoff if backoff is not None else self._backoff
+
+    def getTimeoutSettings(self):
+        """获取超时与重试参数，供asyncio连接池使用相同的设置
+
+        Returns:
+            dict: connectTimeout、readTimeout、retries、backoff、maxBackoff
+        """
+        with self._lock:
+            return {"connectTimeout":self._connectTimeout, "readTimeout":self._readTimeout, "retries":self._retries,
+                    "backoff":self._backoff, "maxBackoff":self._maxBackoff}
+
+    def setUrlMapper(self, urlMapper):
+        """设置地址映射，之后的请求都发往映射后的地址，限流仍按原来的主机进行
+
+        Args:
+            urlMapper (callable): 参数为原地址，返回实际请求的地址，为None时取消映射
+        """
+        self._urlMapper = urlMapper
+
+    def mapUrl(self, url):
+        """获取实际请求的地址
+
+        Args:
+            url (str): 原地址
+
+        Returns:
+            str: 映射后的地址，未设置映射时为原地址
+        """
+        return self._urlMapper(url) if self._urlMapper is not None else url
+
+    def addResponseHook(self, hook):
+        """添加响应钩子，每个请求收到最终响应(重试之后)时在发送请求的线程中调用
+
+        Args:
+            hook (callable): 参数为requests.Response
+        """
+        with self._lock:
+            self._responseHooks.append(hook)
+
+    def removeResponseHook(self, hook):
+        with self._lock:
+            self._responseHooks.remove(hook)
+
+    def request(self, method, url, idempotent=None, retries=None, **kwargs):
+        """通过对应主机的会话发送请求
+
+        Args:
+            method (str): 请求方法
+            url (str): 请求地址
+            idempotent (bool, optional): 请求是否幂等，幂等请求失败后会重试，默认只有GET、HEAD、OPTIONS是幂等的
+            retries (int, optional): 最大重试次数，默认使用连接池的设置
+            其余参数与requests.request相同，未指定timeout时使用连接池的超时设置
+
+        Returns:
+            requests.Response: 响应，其他错误状态码(例如404)由调用者检查
+
+        Raises:
+            requests.HTTPError: 重试用尽后状态码仍是需要重试的状态码(429或5xx)
+        """
+        kwargs.setdefault("timeout", (self._connectTimeout, self._readTimeout))
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+        retries = (self._retries if retries is None else retries) if idempotent else 0
+        limitHost = self.getHost(url)
+        url = self.mapUrl(url)
+        host = self.getHost(url)
+        for attempt in range(retries + 1):
+            if self._limiter is not None:
+                self._limiter.acquire(limitHost)
+            session = self._acquire(host)
+            try:
+                response = session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= retries:
+                    raise
+            else:
+                if response.status_code not in RETRY_STATUS or attempt >= retries:
+                    for hook in list(self._responseHooks):
+                        hook(response)
+                    if response.status_code in RETRY_STATUS: #限流或服务器错误的页面不能当作正常响应
+                        response.raise_for_status()
+                    return response
+                response.close()
+            finally:
+                self._release(host)
+            time.sleep(getBackoff(attempt, self._backoff, self._maxBackoff))
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def getStats(self):
+        """获取连接复用的统计信息
+
+        Returns:
+            dict: 主机 -> {"requests":请求数,"connections":新建连接数,"reused":复用连接的请求数}
+        """
+        with self._lock:
+            stats = {}
+            for host, count in self._requestCount.items():
+                connections = self._closedConnections.get(host, 0)
+                if host in self._sessions:
+                    connections += self._countConnections(self._sessions[host])
+                stats[host] = {"requests":count, "connections":connections, "reused":max(count-connections, 0)}
+            return stats
+
+    def closeAll(self):
+        """关闭所有空闲会话
+        """
+        with self._lock:
+            for host in list(self._sessions):
+                if not self._inUse.get(host):
+                    self._closeSession(host)
+
+    def getHost(self, url):
+        """获取地址对应的主机，即连接池与限流器使用的键
+
+        Args:
+            url (str): 请求地址
+
+        Returns:
+            str: 形如https://so.csdn.net的主机
+        """
+        parts = urlsplit(url)
+        return parts.scheme.lower() + "://" + parts.netloc.lower()
+
+    def _acquire(self, host):
+        with self._lock:
+            now = time.monotonic()
+            self._evictIdle(now)
+            session = self._sessions.get(host)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self._poolSize)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._sessions[host] = session
+            self._lastUsed[host] = now
+            self._inUse[host] = self._inUse.get(host, 0) + 1
+            self._requestCount[host] = self._requestCount.get(host, 0) + 1
+            return session
+
+    def _release(self, host):
+        with self._lock:
+            self._inUse[host] -= 1
+            self._lastUsed[host] = time.monotonic()
+
+    def _evictIdle(self, now):
+        """回收空闲超时的会话，需在持有锁时调用
+        """
+        for host in list(self._sessions):
+            if not self._inUse.get(host) and now - self._lastUsed[host] > self._idleTimeout:
+                self._closeSession(host)
+
+    def _closeSession(self, host):
+        """关闭会话并保留其连接统计，需在持有锁时调用
+        """
+        session = self._sessions.pop(host)
+        self._closedConnections[host] = self._closedConnections.get(host, 0) + self._countConnections(session)
+        session.close()
+
+    def _countConnections(self, session):
+        """统计会话中新建过的连接数
+        """
+        count = 0
+        for adapter in set(session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                if pool is not None:
+                    count += pool.num_connections
+        return count
+
+sessionPool = SessionPool() #进程内共享的连接池
@@ -0,0 +1,112 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+
+class _LeaderCancelled(Exception):
+    """真正执行调用的协程被取消，等待者需要重新发起调用
+    """
+    pass
+
+class SingleFlight(object):
+    """合并相同键的并发调用，同一时刻同一个键只有一个调用真正执行，其余调用等待并共享其结果
+
+    线程中的调用(do)与协程中的调用(doAsync)使用同一张表，两者之间也会合并
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {} #键 -> 正在执行的调用的Future
+        self._stats = {"calls":0, "shared":0}
+
+    def do(self, key, function, *args, **kwargs):
+        """执行调用，相同键的调用正在执行时等待其结果
+
+        Args:
+            key : 调用的键，必须可哈希
+            function (callable): 需要执行的函数
+
+        Returns:
+            函数的返回值，函数抛出的异常会传给所有等待者
+        """
+        while True:
+            future, leader = self._join(key)
+            if leader:
+                break
+            try:
+                return future.result()
+            except _LeaderCancelled: #执行调用的协程被取消，重新发起调用
+                pass
+        try:
+            result = function(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._leave(key)
+
+    async def doAsync(self, key, function, *args, **kwargs):
+        """在协程中执行调用，与do的语义相同
+
+        等待者被取消时不影响正在执行的调用；执行调用的协程被取消时，其余等待者重新发起调用
+
+        Args:
+            key : 调用的键，必须可哈希
+            function (callable): 需要执行的协程函数
+
+        Returns:
+            协程的返回值，协程抛出的异常会传给所有等待者
+        """
+        while True:
+            future, leader = self._join(key)
+            if leader:
+                break
+            try:
+                return await asyncio.shield(asyncio.wrap_future(future)) #被取消时不取消共享的Future
+            except _LeaderCancelled:
+                pass
+        try:
+            result = await function(*args, **kwargs)
+        except asyncio.CancelledError:
+            future.set_exception(_LeaderCancelled())
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._leave(key)
+
+    def _join(self, key):
+        """加入相同键的调用，没有正在执行的调用时成为执行者
+
+        Returns:
+            tuple: (共享的Future,是否由调用者执行)
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            if future is None:
+                future = Future()
+                self._calls[key] = future
+                self._stats["calls"] += 1
+                return future, True
+            self._stats["shared"] += 1
+            return future, False
+
+    def _leave(self, key):
+        with self._lock:
+            del self._calls[key]
+
+    def getStats(self):
+        """获取合并的统计信息
+
+        Returns:
+            dict: calls为真正执行的调用数，shared为被合并的调用数，inFlight为正在执行的调用数
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["inFlight"] = len(self._calls)
+        return stats